@@ -1,11 +1,16 @@
 import streamlit as st 
-import pandas as pd
-import numpy as np
-import plotly.express as px
+
+from siniestros import arranque, metricas
 
 # Configuro para que el layout sea "wide"
 st.set_page_config(layout="wide")
 
+# Cargo en segundo plano los datos y gráficos de Siniestros Viales (una sola vez por proceso)
+arranque.iniciar_precalentamiento()
+
+# Tiempo total de la página (sólo se registra si las métricas están activas)
+inicio_pagina = metricas.ahora()
+
 # BODY ---------------------------------------------------------------------------------------------------------------
 # Descripción
 
@@ -22,8 +27,10 @@ st.write(
         ''')
 
 st.write('#')
+metricas.registrar_desde('inicio.cuerpo', inicio_pagina)
 
 # PROYECTOS -----------------------------------------------------------------------------------------------------------
+inicio_seccion = metricas.ahora()
 
 st.write("## Proyectos")
 
@@ -41,9 +48,11 @@ with proyectos[0]:
             st.page_link("./pages/2_ Siniestros Viales.py", label='VER')
     
 st.write('#')
+metricas.registrar_desde('inicio.proyectos', inicio_seccion)
 
 
 # TAIL ---------------------------------------------------------------------------------------------------------------
+inicio_seccion = metricas.ahora()
 
 # Creo dos columnas
 tail = st.columns(2)
@@ -59,3 +68,10 @@ with tail[0]:
         
 with tail[1]:
     pass
+metricas.registrar_desde('inicio.pie', inicio_seccion)
+
+
+# Métricas de la página ----------------------------------------------------------------------------------------------
+metricas.registrar_desde('inicio.pagina', inicio_pagina)
+metricas.registrar_primera('inicio.primer_pintado', arranque.INICIO)
+metricas.panel()
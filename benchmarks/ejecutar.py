@@ -0,0 +1,210 @@
+"""Benchmarks de la página de Siniestros Viales.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.ejecutar --filas 1000 100000 1000000
+    python -m benchmarks.ejecutar --comparar
+
+Cada corrida agrega una línea JSON por paso y tamaño a `benchmarks/resultados.jsonl`,
+con el commit actual, para poder comparar resultados entre commits.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generador import escribir_csv
+from siniestros import almacenamiento, etl, figuras, graficos
+from siniestros.cubo import CuboConteos
+from siniestros.espacial import ConsultasEspaciales
+from siniestros.indice import IndiceFiltros
+from siniestros.kpi import MotorKPI
+from siniestros.mapa import PiramideEspacial
+
+RAIZ = Path(__file__).resolve().parent.parent
+PAGINA = RAIZ / 'pages' / '2_ Siniestros Viales.py'
+RESULTADOS = Path(__file__).resolve().parent / 'resultados.jsonl'
+
+# Hasta este tamaño se corre la página completa con AppTest
+MAX_FILAS_APPTEST = 1_000_000
+
+# Los mapas no se dibujan, así que alcanza con un token cualquiera
+TOKEN_MAPA = 'benchmark'
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Medidor:
+    """Mide tiempo y, opcionalmente, el pico de memoria de cada paso."""
+
+    def __init__(self, filas, memoria=True):
+        self.filas = filas
+        self.memoria = memoria
+        self.registros = []
+        self.base = {
+            'commit': _commit(),
+            'fecha': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'filas': filas,
+        }
+
+    def medir(self, paso, funcion, *args):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        segundos = time.perf_counter() - inicio
+
+        # El pico de memoria se mide en una segunda corrida para no inflar el tiempo
+        pico_mb = None
+        if self.memoria:
+            tracemalloc.start()
+            funcion(*args)
+            pico_mb = tracemalloc.get_traced_memory()[1] / 2**20
+            tracemalloc.stop()
+
+        self.registros.append({**self.base, 'paso': paso, 'segundos': round(segundos, 6), 'pico_mb': pico_mb})
+        print(f'{self.filas:>12,} {paso:<28} {segundos:10.4f} s' + (f' {pico_mb:10.1f} MB' if pico_mb is not None else ''))
+        return resultado
+
+
+def _fallo_figura(cache, clave, construir):
+    # Vacío la caché en cada corrida: si no, la del pico de memoria sería un acierto
+    cache.limpiar()
+    return cache.obtener(clave, construir)
+
+
+def _pagina_completa(directorio):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    # Página en frío en cada corrida: si no, la del pico de memoria encontraría
+    # el dataset, las estructuras y las figuras ya cargadas por la primera
+    st.cache_resource.clear()
+    etl.invalidar_cache()
+
+    os.environ['SINIESTROS_DATOS'] = str(directorio)
+    try:
+        app = AppTest.from_file(str(PAGINA), default_timeout=3600)
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].message)
+    finally:
+        os.environ.pop('SINIESTROS_DATOS', None)
+
+
+def ejecutar(filas, directorio, memoria=True, apptest=True):
+    medidor = Medidor(filas, memoria)
+    escribir_csv(directorio, filas)
+    ruta_hechos, ruta_victimas = directorio / 'Hechos.csv', directorio / 'Victimas.csv'
+
+    # Carga
+    hechos, victimas = medidor.medir('carga_csv', etl.leer_csv, ruta_hechos, ruta_victimas)
+    if almacenamiento.disponible():
+        binarios = directorio / 'binarios'
+        almacenamiento.escribir(hechos, 'hechos', 'benchmark', binarios)
+        medidor.medir('carga_binaria', almacenamiento.leer, 'hechos', binarios)
+
+    # ETL, con el detalle de cada etapa
+    informe = []
+    df_final = medidor.medir('etl', etl.construir_df_final, hechos, victimas, informe)
+    for etapa in informe:
+        medidor.registros.append({**medidor.base, 'paso': f"etl.{etapa['etapa']}", 'segundos': round(etapa['segundos'], 6), 'pico_mb': None})
+
+    # Estructuras precalculadas
+    indice = medidor.medir('indice_filtros', IndiceFiltros, df_final)
+    cubo = medidor.medir('cubo', CuboConteos.desde_df, df_final)
+    piramide = medidor.medir('piramide', PiramideEspacial.desde_df, df_final)
+    motor_kpi = medidor.medir('kpi', MotorKPI.desde_df, df_final)
+    espacial = medidor.medir('espacial', ConsultasEspaciales, hechos)
+
+    # Filtro típico: todos los años menos uno y la mitad de las comunas
+    selecciones = {dimension: list(valores) for dimension, valores in indice.valores.items()}
+    selecciones['AAAA'] = selecciones['AAAA'][1:]
+    selecciones['COMUNA'] = selecciones['COMUNA'][::2]
+    mascara = medidor.medir('filtro', indice.mascara, selecciones)
+    celdas = medidor.medir('filtro_cubo', cubo.filtrar, selecciones)
+    medidor.medir('kpi_seleccion', lambda: (motor_kpi.homicidios_semestrales(selecciones), motor_kpi.motos_anuales(selecciones)))
+
+    # Consultas espaciales alrededor de la zona con más hechos
+    zona = medidor.medir('espacial.hotspots', espacial.indice.hotspots, 5).iloc[0]
+    medidor.medir('espacial.radio', espacial.indice.en_radio, zona['x'], zona['y'], 500)
+    medidor.medir('espacial.vecinos', espacial.indice.vecinos, zona['x'], zona['y'], 10)
+
+    # Datos y figura de cada gráfico
+    medidor.medir('grafico.por_año', lambda: graficos.figura_por_año(cubo.sumar_por(celdas, 'AAAA')))
+    medidor.medir('grafico.por_comuna', lambda: graficos.figura_por_comuna(cubo.sumar_por(celdas, 'COMUNA')))
+    medidor.medir('grafico.sexo', lambda: graficos.figura_sexo(cubo.sumar_por(celdas, 'SEXO')))
+    medidor.medir('grafico.semestres', lambda: graficos.figura_semestres(cubo.por_semestre(celdas)))
+    medidor.medir('grafico.mapa_celdas', lambda: graficos.figura_mapa_celdas(piramide.celdas(selecciones), TOKEN_MAPA))
+    if mascara.sum() <= 100_000:
+        medidor.medir('grafico.mapa_puntos', lambda: graficos.figura_mapa(df_final[mascara], TOKEN_MAPA))
+
+    # Caché de figuras: la primera vez arma la figura y la serializa, la segunda sólo lee el JSON
+    cache = figuras.CacheFiguras()
+    clave = figuras.clave('por_año', 'benchmark', selecciones)
+    construir = lambda: graficos.figura_por_año(cubo.sumar_por(celdas, 'AAAA'))
+    medidor.medir('figuras.fallo', _fallo_figura, cache, clave, construir)
+    medidor.medir('figuras.acierto', cache.obtener, clave, construir)
+
+    # Página completa sin navegador
+    if apptest and filas <= MAX_FILAS_APPTEST:
+        medidor.medir('pagina_completa', _pagina_completa, directorio)
+
+    return medidor.registros
+
+
+def guardar(registros, ruta=RESULTADOS):
+    with open(ruta, 'a', encoding='utf-8') as archivo:
+        for registro in registros:
+            archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+def comparar(ruta=RESULTADOS):
+    """Compara, paso por paso, los dos últimos commits con resultados."""
+    resultados = pd.read_json(ruta, lines=True)
+    commits = resultados['commit'].drop_duplicates().tolist()[-2:]
+    if len(commits) < 2:
+        print('Se necesitan resultados de al menos dos commits')
+        return
+
+    tabla = (
+        resultados[resultados['commit'].isin(commits)]
+        .groupby(['filas', 'paso', 'commit'])['segundos'].median()
+        .unstack('commit')[commits]
+    )
+    tabla['cambio'] = tabla[commits[1]] / tabla[commits[0]]
+    print(tabla.to_string(float_format='{:.4f}'.format))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks de la página de Siniestros Viales')
+    parser.add_argument('--filas', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--salida', type=Path, default=RESULTADOS)
+    parser.add_argument('--sin-memoria', action='store_true', help='no medir el pico de memoria')
+    parser.add_argument('--sin-apptest', action='store_true', help='no correr la página completa')
+    parser.add_argument('--comparar', action='store_true', help='comparar los dos últimos commits')
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(args.salida)
+        sys.exit()
+
+    for filas in args.filas:
+        with tempfile.TemporaryDirectory() as temporal:
+            registros = ejecutar(filas, Path(temporal), not args.sin_memoria, not args.sin_apptest)
+        guardar(registros, args.salida)
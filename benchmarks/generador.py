@@ -0,0 +1,155 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+#---------------------------------------------------------------------------------------------------------------------
+# Generador de datos sintéticos con la forma de Hechos.csv y Victimas.csv.
+# Las proporciones salen de los datasets del Observatorio Vial.
+
+AÑOS = {2016: 0.207, 2017: 0.188, 2018: 0.205, 2019: 0.148, 2020: 0.112, 2021: 0.140}
+COMUNAS = {
+    0: 0.003, 1: 0.129, 2: 0.036, 3: 0.065, 4: 0.109, 5: 0.032, 6: 0.030, 7: 0.086,
+    8: 0.093, 9: 0.105, 10: 0.042, 11: 0.046, 12: 0.053, 13: 0.057, 14: 0.050, 15: 0.064,
+}
+TIPOS_DE_CALLE = {'AVENIDA': 0.616, 'CALLE': 0.195, 'AUTOPISTA': 0.095, 'GRAL PAZ': 0.094}
+VICTIMAS = {
+    'MOTO': 0.424, 'PEATON': 0.379, 'AUTO': 0.119, 'BICICLETA': 0.042, 'SD': 0.013,
+    'CARGAS': 0.010, 'PASAJEROS': 0.007, 'MOVIL': 0.003, 'OBJETO FIJO': 0.002, 'PEATON_MOTO': 0.001,
+}
+ACUSADOS = {
+    'AUTO': 0.293, 'PASAJEROS': 0.249, 'CARGAS': 0.210, 'OBJETO FIJO': 0.089, 'MOTO': 0.082,
+    'SD': 0.033, 'MULTIPLE': 0.024, 'BICICLETA': 0.010, 'OTRO': 0.009, 'TREN': 0.001,
+}
+ROLES = {'CONDUCTOR': 0.46, 'PEATON': 0.372, 'PASAJERO_ACOMPAÑANTE': 0.112, 'CICLISTA': 0.04, 'SD': 0.016}
+SEXOS = {'MASCULINO': 0.76, 'FEMENINO': 0.232, 'SD': 0.008}
+CALLES = ['PIEDRA BUENA AV.', 'PAZ, GRAL. AV.', 'ENTRE RIOS AV.', 'RIVADAVIA AV.', 'CORRIENTES AV.', 'SAN JUAN AV.']
+
+# Centro aproximado de la ciudad (lon, lat)
+CENTRO_CIUDAD = (-58.44, -34.61)
+
+# Proporciones de valores faltantes o mal formados
+PROP_SD_HORA = 0.002
+PROP_SD_EDAD = 0.08
+PROP_COORDENADA_INVALIDA = 0.017
+# Cantidad media de víctimas adicionales por hecho
+VICTIMAS_EXTRA = 0.03
+
+
+def _elegir(rng, probabilidades, n):
+    valores = np.array(list(probabilidades.keys()))
+    pesos = np.array(list(probabilidades.values()), dtype=float)
+    return valores[rng.choice(len(valores), size=n, p=pesos / pesos.sum())]
+
+
+def _con_huecos(rng, valores, proporcion, hueco='SD'):
+    valores = valores.astype(object)
+    valores[rng.random(len(valores)) < proporcion] = hueco
+    return valores
+
+
+def generar_bloque(n_hechos, rng, primer_numero=0):
+    """Genera `n_hechos` hechos y sus víctimas. Devuelve `(hechos, victimas)`."""
+    numeros = np.arange(primer_numero, primer_numero + n_hechos)
+    años = _elegir(rng, AÑOS, n_hechos)
+    meses = rng.integers(1, 13, n_hechos)
+    dias = rng.integers(1, 29, n_hechos)
+    horas = rng.integers(0, 24, n_hechos)
+    minutos = rng.choice([0, 15, 30, 45], n_hechos)
+    comunas = _elegir(rng, COMUNAS, n_hechos)
+
+    ids = pd.Series(años.astype(str)).str.cat(pd.Series(numeros).astype(str).str.zfill(7), sep='-')
+    fechas = pd.Series(años.astype(str)) + '-' + pd.Series(meses).astype(str).str.zfill(2) + '-' + pd.Series(dias).astype(str).str.zfill(2)
+    hora = pd.Series(horas).astype(str).str.zfill(2) + ':' + pd.Series(minutos).astype(str).str.zfill(2) + ':00'
+
+    # Coordenadas alrededor del centro de la ciudad, con algunos puntos inválidos ('.')
+    lon = CENTRO_CIUDAD[0] + rng.normal(0, 0.045, n_hechos)
+    lat = CENTRO_CIUDAD[1] + rng.normal(0, 0.04, n_hechos)
+    x_caba = 100000 + (lon - CENTRO_CIUDAD[0]) * 91600
+    y_caba = 101000 + (lat - CENTRO_CIUDAD[1]) * 110900
+    invalidas = rng.random(n_hechos) < PROP_COORDENADA_INVALIDA
+
+    pos_x = pd.Series(lon).map('{:.8f}'.format).mask(invalidas, '.')
+    pos_y = pd.Series(lat).map('{:.8f}'.format).mask(invalidas, '.')
+    xy = ('Point (' + pd.Series(x_caba).map('{:.8f}'.format) + ' ' + pd.Series(y_caba).map('{:.8f}'.format) + ')').mask(invalidas, 'Point (. .)')
+
+    victima = _elegir(rng, VICTIMAS, n_hechos)
+    acusado = _elegir(rng, ACUSADOS, n_hechos)
+    calle = np.array(CALLES)[rng.integers(0, len(CALLES), n_hechos)]
+    altura = np.where(rng.random(n_hechos) < 0.5, rng.integers(1, 9000, n_hechos).astype(float), np.nan)
+
+    hechos = pd.DataFrame({
+        'ID': ids,
+        'N_VICTIMAS': 1,
+        'FECHA': fechas,
+        'AAAA': años,
+        'MM': meses,
+        'DD': dias,
+        'HORA': _con_huecos(rng, hora.to_numpy(), PROP_SD_HORA),
+        'HH': _con_huecos(rng, horas.astype(str), PROP_SD_HORA),
+        'LUGAR_DEL_HECHO': calle,
+        'TIPO_DE_CALLE': _elegir(rng, TIPOS_DE_CALLE, n_hechos),
+        'Calle': calle,
+        'Altura': altura,
+        'Cruce': np.where(np.isnan(altura), np.roll(calle, 1), None),
+        'Dirección Normalizada': calle,
+        'COMUNA': comunas,
+        'XY (CABA)': xy,
+        'pos x': pos_x,
+        'pos y': pos_y,
+        'PARTICIPANTES': pd.Series(victima).str.cat(pd.Series(acusado), sep='-'),
+        'VICTIMA': victima,
+        'ACUSADO': acusado,
+    })
+
+    # Algunos hechos tienen más de una víctima
+    cantidad = 1 + rng.poisson(VICTIMAS_EXTRA, n_hechos)
+    hechos['N_VICTIMAS'] = cantidad
+    repetidos = np.repeat(np.arange(n_hechos), cantidad)
+    n_victimas = len(repetidos)
+
+    edades = rng.integers(1, 96, n_victimas).astype(str)
+    victimas = pd.DataFrame({
+        'ID_hecho': ids.to_numpy()[repetidos],
+        'FECHA': fechas.to_numpy()[repetidos],
+        'AAAA': años[repetidos],
+        'MM': meses[repetidos],
+        'DD': dias[repetidos],
+        'ROL': _elegir(rng, ROLES, n_victimas),
+        'VICTIMA': victima[repetidos],
+        'SEXO': _elegir(rng, SEXOS, n_victimas),
+        'EDAD': _con_huecos(rng, edades, PROP_SD_EDAD),
+        'FECHA_FALLECIMIENTO': fechas.to_numpy()[repetidos] + ' 00:00:00',
+    })
+    return hechos, victimas
+
+
+def escribir_csv(directorio, filas, semilla=0, bloque=1_000_000):
+    """Escribe Hechos.csv y Victimas.csv con aproximadamente `filas` víctimas.
+
+    Los datos se generan y escriben por bloques para poder llegar a decenas de
+    millones de filas sin tenerlos todos en memoria.
+    """
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(semilla)
+
+    n_hechos = max(1, round(filas / (1 + VICTIMAS_EXTRA)))
+    primero = True
+    for inicio in range(0, n_hechos, bloque):
+        hechos, victimas = generar_bloque(min(bloque, n_hechos - inicio), rng, inicio)
+        modo = 'w' if primero else 'a'
+        hechos.to_csv(directorio / 'Hechos.csv', mode=modo, header=primero, index=False)
+        victimas.to_csv(directorio / 'Victimas.csv', mode=modo, header=primero, index=False)
+        primero = False
+    return directorio
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Genera datasets sintéticos de siniestros viales')
+    parser.add_argument('directorio')
+    parser.add_argument('--filas', type=int, default=10_000)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    print(escribir_csv(args.directorio, args.filas, args.semilla))
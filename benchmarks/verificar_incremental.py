@@ -0,0 +1,137 @@
+"""Verificación de la actualización incremental contra una reconstrucción completa.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.verificar_incremental
+    python -m benchmarks.verificar_incremental --filas 20000    # con datos sintéticos
+
+Aplica en secuencia una actualización desde los CSV, otra sobre los mismos
+binarios y un delta, y después de cada paso compara `df_final`, el cubo, los niveles
+de la pirámide y las celdas de los KPIs guardados con los que salen de correr
+el ETL sobre los datos completos.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.generador import escribir_csv
+from siniestros import almacenamiento, etl, incremental
+from siniestros.cubo import DIMENSIONES_CUBO, agregar
+from siniestros.kpi import DIMENSIONES_KPI, agregar_kpi
+from siniestros.mapa import CLAVES_NIVEL, NIVELES, agregar_nivel, nombre_nivel
+
+
+def _normalizar(df, columnas_orden):
+    # Las categorías pueden quedar en otro orden: comparo los valores
+    df = df.copy()
+    for columna in df.columns:
+        if isinstance(df[columna].dtype, pd.CategoricalDtype):
+            df[columna] = df[columna].astype(object)
+    df = df.astype({columna: str for columna in columnas_orden})
+    return df.sort_values(columnas_orden).reset_index(drop=True)
+
+
+def comparar(directorio, hechos, victimas):
+    """Compara los binarios de `directorio` con el ETL completo de `hechos` y `victimas`."""
+    binarios = directorio / 'binarios'
+    esperado = etl.construir_df_final(hechos, victimas)
+    guardado = almacenamiento.leer('df_final', binarios)
+    orden = list(esperado.columns)
+    pd.testing.assert_frame_equal(
+        _normalizar(guardado[orden], orden), _normalizar(esperado, orden),
+        check_dtype=False, check_categorical=False,
+    )
+
+    celdas = almacenamiento.leer('cubo', binarios)
+    pd.testing.assert_frame_equal(
+        _normalizar(celdas, DIMENSIONES_CUBO), _normalizar(agregar(esperado), DIMENSIONES_CUBO),
+        check_dtype=False, check_categorical=False,
+    )
+
+    pd.testing.assert_frame_equal(
+        _normalizar(almacenamiento.leer('kpi', binarios), DIMENSIONES_KPI),
+        _normalizar(agregar_kpi(esperado), DIMENSIONES_KPI),
+        check_dtype=False, check_categorical=False,
+    )
+
+    # Las sumas de coordenadas se corrigen restando y sumando: pueden diferir en el redondeo
+    for numero, tamaño in enumerate(NIVELES):
+        pd.testing.assert_frame_equal(
+            _normalizar(almacenamiento.leer(nombre_nivel(numero), binarios), CLAVES_NIVEL),
+            _normalizar(agregar_nivel(esperado, tamaño), CLAVES_NIVEL),
+            check_dtype=False, check_categorical=False, rtol=1e-9,
+        )
+
+
+def _modificar(hechos, posicion, columna, valor):
+    hechos = hechos.copy()
+    hechos.loc[hechos.index[posicion], columna] = valor
+    return hechos
+
+
+def verificar(directorio):
+    directorio = Path(directorio)
+    ruta_hechos, ruta_victimas = directorio / 'Hechos.csv', directorio / 'Victimas.csv'
+    leer = lambda: etl.leer_csv(ruta_hechos, ruta_victimas)
+    # Las modificaciones se hacen sobre los CSV crudos (con sus SD), cómo una actualización real de las fuentes
+    crudos = lambda: (pd.read_csv(ruta_hechos), pd.read_csv(ruta_victimas))
+
+    # 1. Construcción desde cero
+    print(incremental.actualizar(ruta_hechos, ruta_victimas))
+    comparar(directorio, *leer())
+
+    # 2. Primera actualización desde los CSV: un hecho modificado y uno dado de baja
+    hechos, victimas = crudos()
+    hechos = _modificar(hechos, 3, 'TIPO_DE_CALLE', 'AUTOPISTA')
+    baja = str(hechos['ID'].iloc[-1])
+    hechos = hechos[hechos['ID'].astype(str) != baja]
+    victimas = victimas[victimas['ID_hecho'].astype(str) != baja]
+    hechos.to_csv(ruta_hechos, index=False)
+    victimas.to_csv(ruta_victimas, index=False)
+    print(incremental.actualizar(ruta_hechos, ruta_victimas))
+    comparar(directorio, *leer())
+
+    # 3. Segunda actualización desde los CSV sobre los mismos binarios
+    hechos, victimas = crudos()
+    hechos = _modificar(hechos, 10, 'COMUNA', 0 if hechos['COMUNA'].iloc[10] != 0 else 1)
+    hechos.to_csv(ruta_hechos, index=False)
+    print(incremental.actualizar(ruta_hechos, ruta_victimas))
+    comparar(directorio, *leer())
+
+    # 4. Delta con un hecho corregido y uno nuevo (con su víctima)
+    hechos, victimas = crudos()
+    corregido = _modificar(hechos.iloc[[20]], 0, 'TIPO_DE_CALLE', 'CALLE')
+    nuevo = hechos.iloc[[21]].assign(ID='DELTA-0001')
+    victima_nueva = victimas[victimas['ID_hecho'].astype(str) == str(hechos['ID'].iloc[21])].iloc[[0]].assign(ID_hecho='DELTA-0001')
+    delta_hechos, delta_victimas = directorio / 'delta_hechos.csv', directorio / 'delta_victimas.csv'
+    pd.concat([corregido, nuevo]).to_csv(delta_hechos, index=False)
+    victima_nueva.to_csv(delta_victimas, index=False)
+    print(incremental.actualizar(ruta_hechos, ruta_victimas, delta_hechos, delta_victimas))
+
+    # Lo esperado: los CSV con el delta aplicado
+    hechos = pd.concat([hechos[hechos['ID'].astype(str) != str(corregido['ID'].iloc[0])], corregido, nuevo], ignore_index=True)
+    victimas = pd.concat([victimas, victima_nueva], ignore_index=True)
+    hechos.to_csv(directorio / 'esperado_hechos.csv', index=False)
+    victimas.to_csv(directorio / 'esperado_victimas.csv', index=False)
+    comparar(directorio, *etl.leer_csv(directorio / 'esperado_hechos.csv', directorio / 'esperado_victimas.csv'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifica la actualización incremental contra el ETL completo')
+    parser.add_argument('--filas', type=int, help='usar datos sintéticos con esta cantidad de víctimas (por defecto, los CSV del repositorio)')
+    args = parser.parse_args()
+
+    if not almacenamiento.disponible():
+        sys.exit('Se necesita pyarrow para la actualización incremental')
+
+    with tempfile.TemporaryDirectory() as temporal:
+        if args.filas:
+            escribir_csv(temporal, args.filas)
+        else:
+            for nombre in ['Hechos.csv', 'Victimas.csv']:
+                shutil.copy(etl.DIR_DATOS / nombre, temporal)
+        verificar(temporal)
+    print('OK: df_final, cubo, pirámide y KPIs coinciden con la reconstrucción completa')
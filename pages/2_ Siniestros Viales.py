@@ -1,75 +1,59 @@
 import streamlit as st 
 import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
+
+from siniestros import arranque, etl, figuras, metricas, streaming
+from siniestros.cubo import cargar_cubo
+from siniestros.espacial import cargar_espacial
+from siniestros.etl import cargar_datos
+from siniestros.indice import cargar_indice
+from siniestros.kpi import AÑO_PANDEMIA, cargar_kpi, formatear, nombre_semestre
+from siniestros.mapa import cargar_piramide
+from siniestros.visor import cargar_visor, mostrar_visor
 
 # Configuro para que el layout sea "wide"
 st.set_page_config(layout="wide")
 
-#---------------------------------------------------------------------------------------------------------------------
-# Cargo los Datasets
-hechos = pd.read_csv('./Datasets/Hechos.csv')
-victimas = pd.read_csv('./Datasets/Victimas.csv')
-
-# Mini ETL
-# Reemplazo valores SD (Sin Dato) por valores None
-victimas = victimas.replace("SD",np.nan)
-hechos = hechos.replace("SD",np.nan)
-
-# Creo listas con las columnas que necesito
-hechos_reducido = hechos[['ID', 'COMUNA', 'TIPO_DE_CALLE', 'AAAA','MM','HH', 'VICTIMA', 'ACUSADO', 'pos x', 'pos y']]
-victimas_reducido = victimas[['ID_hecho', 'SEXO', 'EDAD']]
-
-# Renombro 'ID_hecho'
-victimas_reducido = victimas_reducido.rename(columns={'ID_hecho': 'ID'})
-
-# Merge para crear el dataset final
-df_final = pd.merge(hechos_reducido, victimas_reducido, on='ID', how='inner')
-
-# Transformo la columna 'EDAD' a numérico
-df_final['EDAD'] = pd.to_numeric(df_final['EDAD'], errors='coerce')
-
-# Creo una columna con el grupo etario en base a 'EDAD'
-bins = [0, 12, 18, 35, 50, 65, 100]  # Definir los rangos de edad
-labels = ['Niño', 'Adolescente', 'Joven Adulto', 'Adulto', 'Adulto Maduro', 'Adulto Mayor']  # Definir los nombres de los grupos etarios
-df_final['GRUPO ETARIO'] = pd.cut(df_final['EDAD'], bins=bins, labels=labels, right=False)
-
-# Elimino la columna EDAD
-df_final = df_final.drop(columns=['EDAD'])
-
-# Ordeno la columna 'COMUNA'
-df_final.sort_values(by='COMUNA', inplace=True)
+# Tiempo total de la página (sólo se registra si las métricas están activas)
+inicio_pagina = metricas.ahora()
 
-# Le agrego la palabra 'COMUNA' a cada palabra de la columna comuna.
-df_final['COMUNA'] = df_final['COMUNA'].apply(lambda x: f'COMUNA {str(x)}')
-
- # Reemplazo la 'COMUNA 0' por Desconocido.
-df_final['COMUNA']  = df_final['COMUNA'].apply(lambda x: 'DESCONOCIDO' if x == 'COMUNA 0' else x)
-
-# Creo una función para limpiar las columnas 'pos x' y 'pos y'
-def limpiar_y_convertir(columna):
-    # Eliminar espacios y valores no numéricos que consisten solo en '.'
-    columna = columna.str.strip().replace('.', '')
-    # Reemplazar valores vacíos o no válidos con NaN
-    columna = pd.to_numeric(columna, errors='coerce')
-    return columna
-
-# Aplico la función a las columnas
-df_final['pos y'] = limpiar_y_convertir(df_final['pos y'])
-df_final['pos x'] = limpiar_y_convertir(df_final['pos x'])
-
-# Cambio los valores nulos a 0
-df_final['HH'] = df_final['HH'].fillna(0)
-# Transformo los valores a flotantes
-df_final['HH'] = df_final['HH'].astype(int)
-
-# Creo dos columnas para los semestres
-df_final['SEM_1'] = df_final['MM'].apply(lambda x: 1 if x <= 6 else 0)
-df_final['SEM_2'] = df_final['MM'].apply(lambda x: 0 if x <= 6 else 1)
-
-# Cambio los valores nulos por 'SIN DATO'
-df_final['VICTIMA'] = df_final['VICTIMA'].fillna('DESCONOCIDO')
+#---------------------------------------------------------------------------------------------------------------------
+# Cargo los Datasets y el dataset final (cacheados según el contenido de los CSV)
+if streaming.activo():
+    # Modo streaming: sólo agregados calculados por bloques y una muestra de los datos crudos
+    with metricas.tramo('siniestros.carga'):
+        hechos, victimas = streaming.cargar_muestras()
+        agregados = streaming.cargar_agregados()
+    df_final = None
+    cubo, piramide, motor_kpi = agregados.cubo, agregados.piramide, agregados.kpi
+    indice = cubo.indice
+
+else:
+    with metricas.tramo('siniestros.carga'):
+        hechos, victimas, df_final = cargar_datos()
+
+    # Índice de bitmaps para resolver los filtros del dashboard
+    with metricas.tramo('siniestros.indice'):
+        indice = cargar_indice(df_final)
+
+    # Cubo de conteos del que salen los gráficos
+    with metricas.tramo('siniestros.cubo'):
+        cubo = cargar_cubo(df_final)
+
+    # Pirámide de grillas para el mapa
+    with metricas.tramo('siniestros.piramide'):
+        piramide = cargar_piramide(df_final)
+
+    # Motor de KPIs (medidas por año, semestre, comuna y filtros)
+    with metricas.tramo('siniestros.kpi'):
+        motor_kpi = cargar_kpi(df_final)
+
+# Figuras ya armadas, por versión de los datos y selección de filtros
+cache_figuras = figuras.cargar_figuras()
+huella = etl.huella_version()
+
+# Índice espacial de los hechos para las consultas por distancia
+with metricas.tramo('siniestros.espacial'):
+    espacial = cargar_espacial(hechos)
 #---------------------------------------------------------------------------------------------------------------------
 ### TÍTULO
 st.write("### Informe sobre siniestros viales en la ciudad de Buenos Aires") 
@@ -90,23 +74,29 @@ Para este estudio, segmenté la información y me dediqué a estudiar sólo los
 \n ###''')
 
 
-# Datasets Hechos
+# Datasets Hechos (paginado: sólo se envía la página visible)
 with st.expander("Hechos"):
     st.write("En este Dataset se registran los datos sobre el lugar geográfico y la hora de cada siniestro")
-    st.dataframe(hechos,column_config={
-        "AAAA": st.column_config.NumberColumn("AÑO",format="%d"),
-        "MM": st.column_config.NumberColumn("MES"),
-        "DD": st.column_config.NumberColumn("DIA"),
-        "FECHA":st.column_config.DateColumn(format="DD.MM.YYYY")
-    })
+    if streaming.activo():
+        st.caption(f"Se muestran las primeras {streaming.FILAS_MUESTRA} filas del dataset")
+    with metricas.tramo('siniestros.visor_hechos'):
+        mostrar_visor(cargar_visor('hechos', hechos), 'hechos', column_config={
+            "AAAA": st.column_config.NumberColumn("AÑO",format="%d"),
+            "MM": st.column_config.NumberColumn("MES"),
+            "DD": st.column_config.NumberColumn("DIA"),
+            "FECHA":st.column_config.DateColumn(format="DD.MM.YYYY")
+        })
     
 # Datasets Victimas
 with st.expander("Victimas"):
     st.write("En este Dataset se registran los datos centrados en los participantes de los siniestros, el estado de las victimas y los vehículos implicados")
-    st.dataframe(victimas, column_config={
-        "FECHA":st.column_config.DateColumn(format="DD.MM.YYYY"),
-        "FECHA_FALLECIMIENTO":st.column_config.DatetimeColumn(format="DD.MM.YYYY h:mm a")
-    })
+    if streaming.activo():
+        st.caption(f"Se muestran las primeras {streaming.FILAS_MUESTRA} filas del dataset")
+    with metricas.tramo('siniestros.visor_victimas'):
+        mostrar_visor(cargar_visor('victimas', victimas), 'victimas', column_config={
+            "FECHA":st.column_config.DateColumn(format="DD.MM.YYYY"),
+            "FECHA_FALLECIMIENTO":st.column_config.DatetimeColumn(format="DD.MM.YYYY h:mm a")
+        })
 st.write("##")
 
 
@@ -163,7 +153,7 @@ with kpi2:
     st.write(f"*Reducir en un 7% la cantidad de accidentes mortales de motociclistas en el último año*")
     st.latex(
         r'''
-        KPI = \frac{SM actual}{SM anterior * 0.7}
+        KPI = \frac{SM actual}{SM anterior * 0.93}
         '''
     )
 
@@ -175,26 +165,47 @@ with kpi2:
     ''')
 st.write("##")
 
-### INTRODUCCIÓN
+### CONCLUSIONES
 st.write("#### **Conclusiones** \n *Midiendo los siniestros*")
 
+# Valores de los KPIs sobre todos los datos (en el dashboard dependen de los filtros)
+with metricas.tramo('siniestros.kpi_conclusiones'):
+    kpi_semestre = motor_kpi.homicidios_semestrales({}).iloc[-1]
+    kpi_motos = motor_kpi.motos_anuales({}).iloc[-1]
+    # El año posterior a la pandemia contra el anterior a ella, sin importar cuál sea el último año cargado
+    kpi_motos_2 = motor_kpi.motos_entre(AÑO_PANDEMIA + 1, AÑO_PANDEMIA - 1)
+
+año_kpi, semestre_kpi = int(kpi_semestre['AAAA']), int(kpi_semestre['SEMESTRE'])
+semestre_anterior = nombre_semestre(año_kpi, 1) if semestre_kpi == 2 else nombre_semestre(año_kpi - 1, 2)
+año_motos = int(kpi_motos['AAAA'])
+
+if kpi_semestre['CUMPLE']:
+    resultado_kpi1 = 'Si bien el objetivo se alcazó, bajando considerablemente los homicidios en siniestros, se debe comprender que  el valor sigue siendo alto'
+else:
+    resultado_kpi1 = 'El objetivo no se alcanzó, y el valor sigue siendo alto'
+
+if kpi_motos_2 is not None:
+    comparacion_pandemia = f'''Sin embargo, tengamos en cuenta que el año {AÑO_PANDEMIA} fue un caso excepcional gracias a la pandemia de COVID-19. Esta, al obligar a las personas a permanecer aisladas, ha influenciado a la caída rotunda de homicidios en siniestros. Por lo que lo optimo para el estudio sería comparar al año {AÑO_PANDEMIA + 1} con el año {AÑO_PANDEMIA - 1}.
+
+En el {AÑO_PANDEMIA - 1} hubo {formatear(kpi_motos_2['ANTERIOR'])} casos en total, si tomamos este dato cómo 'SM anterior', deberíamos obtener menos de {formatear(kpi_motos_2['OBJETIVO'])} casos para que el KPI se cumpla. Por lo que, al tener {formatear(kpi_motos_2['ACTUAL'])} casos en {AÑO_PANDEMIA + 1} podemos ver que todavía hay mucho que mejorar.'''
+else:
+    comparacion_pandemia = ''
+
 st.write(
     f'''
     \n ###
 
 **Primer KPI:**
 
-Para que se cumpla el primer KPI, el segundo semestre debería haber una cantidad de casos menor a 49.5. Hubo, en cambio, una cantidad de 42 casos. Este corresponde al 76.3% de los casos ocurridos en el primer semestre.
+Para que se cumpla el primer KPI, el {nombre_semestre(año_kpi, semestre_kpi)} debería haber una cantidad de casos menor a {formatear(kpi_semestre['OBJETIVO'])}. Hubo, en cambio, una cantidad de {formatear(kpi_semestre['ACTUAL'])} casos. Este corresponde al {formatear(kpi_semestre['RATIO'] * 100)}% de los casos ocurridos en el {semestre_anterior}.
 
-Si bien el objetivo se alcazó, bajando considerablemente los homicidios en siniestros, se debe comprender que  el valor sigue siendo alto, por lo que sería optimo que se realicen más controles e inversión en infraestructura de seguridad para bajar aún más el número de casos.
+{resultado_kpi1}, por lo que sería optimo que se realicen más controles e inversión en infraestructura de seguridad para bajar aún más el número de casos.
 
 **Segundo KPI:**
 
-Para que se cumpla el segundo KPI, en el año 2021 debió haber contado con menos de 26 casos. En este año ocurrieron 46 casos en total, el 164,2% comparado al año 2020.
+Para que se cumpla el segundo KPI, en el año {año_motos} debió haber contado con menos de {formatear(kpi_motos['OBJETIVO'])} casos. En este año ocurrieron {formatear(kpi_motos['ACTUAL'])} casos en total, el {formatear(kpi_motos['RATIO'] * 100)}% comparado al año {año_motos - 1}.
 
-Sin embargo, tengamos en cuenta que el año 2020 fue un caso excepcional gracias a la pandemia de COVID-19. Esta, al obligar a las personas a permanecer aisladas, ha influenciado a la caída rotunda de homicidios en siniestros. Por lo que lo optimo para el estudio sería comparar al año 2021 con el año 2019.
-
-En el 2019 hubo 50 casos en total, si tomamos este dato cómo 'SM anterior', deberíamos obtener menos de 46.5 casos para que el KPI se cumpla. Por lo que, al tener 46 casos en 2021 podemos ver que todavía hay mucho que mejorar.
+{comparacion_pandemia}
 
 Cómo en el primer KPI, se debe invertir aún más en controles de transito e infraestructura, pero también sería buena idea invertir en campañas de concientización para motociclistas.
 
@@ -205,191 +216,223 @@ Cómo en el primer KPI, se debe invertir aún más en controles de transito e in
 st.write("#### Dashboard")
 
 ## FILTROS
-with st.popover('FILTROS',use_container_width=True):
-    # Filtración por AÑO --------------------------------------------------------------------------
-    # Creo una lista para almacenar los años
-    años = []
-    for i in df_final['AAAA']:
-        if i not in años:
-            años.append(i)
-
-    # Ordeno la lista
-    años.sort()
-
-    # Filtro por AÑO
-    años_filtradas = st.multiselect(
-        "FILTRAR POR AÑO",
-        años,
-        años)
-            
-
-    # Filtración por COMUNAS -----------------------------------------------------------------------
-    comunas = []
-    for i in df_final['COMUNA']:
-        if i not in comunas:
-            comunas.append(i)
-
-    # Filtro por COMUNAS
-    comuna_filtradas = st.multiselect(
-        "FILTRAR POR COMUNA",
-        comunas,
-        comunas,
-        help='Selecciona una opción'
-        )
+# El dashboard y las consultas espaciales son fragmentos: al aplicar filtros o mover
+# sus controles sólo se vuelve a ejecutar el fragmento, no el texto ni los visores.
+def filtros():
+    """Popover con los filtros. Es un formulario, así varios cambios se aplican juntos con un solo recálculo."""
+    with st.popover('FILTROS',use_container_width=True), st.form('filtros', border=False):
+        # Filtración por AÑO --------------------------------------------------------------------------
+        # Los valores distintos (ya ordenados) salen del índice de filtros
+        años = indice.valores['AAAA']
 
+        # Filtro por AÑO
+        años_filtradas = st.multiselect(
+            "FILTRAR POR AÑO",
+            años,
+            años)
 
-    # Filtración por GRUPO ETARIO ------------------------------------------------------------------
-    st.write('***Niño:*** Hasta 12 años // ***Adolescente:*** De 13 a 18 años // ***Joven Adulto:*** De 19 a 35 años // ***Adulto:*** De 36 a 50 años // ***Adulto Maduro:*** De 51 a 65 años // ***Adulto Mayor:*** Mayor de 65 años')
-
-    # Filtro por GRUPO ETARIO
-    edades_filtradas = st.multiselect(
-        "FILTRAR POR GRUPO ETARIO",
-        ['Niño', 'Adolescente', 'Joven Adulto', 'Adulto', 'Adulto Maduro', 'Adulto Mayor'],
-        ['Niño', 'Adolescente', 'Joven Adulto', 'Adulto', 'Adulto Maduro', 'Adulto Mayor']
-        )
 
+        # Filtración por COMUNAS -----------------------------------------------------------------------
+        comunas = indice.valores['COMUNA']
 
-    # Filtración por TIPO DE CALLE -----------------------------------------------------------------------
-    calles = []
-    for i in df_final['TIPO_DE_CALLE']:
-        if i not in calles:
-            calles.append(i)
+        # Filtro por COMUNAS
+        comuna_filtradas = st.multiselect(
+            "FILTRAR POR COMUNA",
+            comunas,
+            comunas,
+            help='Selecciona una opción'
+            )
 
-    # Filtro por COMUNAS
-    calles_filtradas = st.multiselect(
-        "FILTRAR POR TIPO DE CALLE",
-        calles,
-        calles,
-        help='Selecciona una opción'
-        )
 
+        # Filtración por GRUPO ETARIO ------------------------------------------------------------------
+        st.write('***Niño:*** Hasta 12 años // ***Adolescente:*** De 13 a 18 años // ***Joven Adulto:*** De 19 a 35 años // ***Adulto:*** De 36 a 50 años // ***Adulto Maduro:*** De 51 a 65 años // ***Adulto Mayor:*** Mayor de 65 años')
 
-    ### DATAFRAME FILTRADO ###
-    df_filtrado = df_final[(df_final['COMUNA'].isin(comuna_filtradas)) & (df_final['GRUPO ETARIO'].isin(edades_filtradas)) & (df_final['AAAA'].isin(años_filtradas)) & (df_final['TIPO_DE_CALLE'].isin(calles_filtradas))]
-
+        # Filtro por GRUPO ETARIO
+        edades_filtradas = st.multiselect(
+            "FILTRAR POR GRUPO ETARIO",
+            indice.valores['GRUPO ETARIO'],
+            indice.valores['GRUPO ETARIO']
+            )
 
-# ----------------------------------------------------------------------------------------------------------------------
-st.write('####')
-x = len(df_filtrado)
 
-st.write(f"##### Casos totales: {x}")
+        # Filtración por TIPO DE CALLE -----------------------------------------------------------------------
+        calles = indice.valores['TIPO_DE_CALLE']
 
+        # Filtro por COMUNAS
+        calles_filtradas = st.multiselect(
+            "FILTRAR POR TIPO DE CALLE",
+            calles,
+            calles,
+            help='Selecciona una opción'
+            )
 
+        st.form_submit_button('Aplicar filtros', use_container_width=True)
 
-fig = go.Figure() # Scatter Plot ----------------------------------------------------------------------------------------
 
-# Creo una lista que contenga todos los años y la cantidad de casos en esos años
-conteo_por_año = df_filtrado['AAAA'].value_counts().sort_index()
+    ### DATAFRAME FILTRADO ###
+    return {
+        'AAAA': años_filtradas,
+        'COMUNA': comuna_filtradas,
+        'GRUPO ETARIO': edades_filtradas,
+        'TIPO_DE_CALLE': calles_filtradas,
+    }
 
-# Creo el gráfico
-fig.add_trace(go.Scatter(x=conteo_por_año.index, y=conteo_por_año.values, mode='lines+markers'))
 
-# Etiquetas
-fig.update_layout(
-    title='Cantidad de casos por año',
-    xaxis_title='Año',
-    yaxis_title='Cantidad de casos'
-)
-st.plotly_chart(fig,use_container_width=True)
+@st.fragment
+def kpi_por_comuna(selecciones, ultimo_semestre):
+    # Detalle por comuna, con ventanas móviles de varios semestres (cambiar la ventana sólo recalcula esta tabla)
+    with st.expander("KPIs por comuna"):
+        ventana = st.selectbox("Ventana (semestres)", [1, 2, 4], key='kpi_ventana')
+        por_comuna = motor_kpi.homicidios_semestrales(selecciones, ventana=ventana, por_comuna=True)
+        por_comuna = por_comuna[
+            (por_comuna['AAAA'] == ultimo_semestre['AAAA']) & (por_comuna['SEMESTRE'] == ultimo_semestre['SEMESTRE'])
+        ]
+        st.dataframe(por_comuna.drop(columns=['AAAA', 'SEMESTRE']), hide_index=True, column_config={
+            'ACTUAL': st.column_config.NumberColumn('H actual', format='%d'),
+            'ANTERIOR': st.column_config.NumberColumn('H anterior', format='%d'),
+            'OBJETIVO': st.column_config.NumberColumn('Objetivo', format='%.1f'),
+            'RATIO': st.column_config.NumberColumn('Actual / anterior', format='%.2f'),
+            'KPI': st.column_config.NumberColumn('KPI', format='%.2f'),
+            'CUMPLE': st.column_config.CheckboxColumn('Cumple'),
+        })
+
+
+@st.fragment
+def dashboard():
+    inicio_dashboard = metricas.ahora()
+    selecciones = filtros()
+
+    # ------------------------------------------------------------------------------------------------------------------
+    # Los gráficos se arman sumando las celdas filtradas del cubo de conteos.
+    # Cada gráfico tiene su clave en la caché de figuras: con la misma selección no se vuelve a armar.
+    with metricas.tramo('siniestros.filtro_cubo'):
+        tablero = figuras.FigurasDashboard(selecciones, cubo, piramide, token, df_final, indice, huella, cache_figuras)
+
+    st.write('####')
+    st.write(f"##### Casos totales: {tablero.casos}")
+
+
+    # KPIs de la selección --------------------------------------------------------------------------------------------
+    with metricas.tramo('siniestros.kpi_seleccion'):
+        semestres_kpi = motor_kpi.homicidios_semestrales(selecciones)
+        motos_kpi = motor_kpi.motos_anuales(selecciones)
+
+    if len(semestres_kpi):
+        indicadores = st.columns(2)
+        ultimo_semestre, ultimo_año = semestres_kpi.iloc[-1], motos_kpi.iloc[-1]
+
+        with indicadores[0]:
+            st.metric(
+                f"Homicidios en el {nombre_semestre(int(ultimo_semestre['AAAA']), int(ultimo_semestre['SEMESTRE']))}",
+                formatear(ultimo_semestre['ACTUAL']),
+                None if pd.isna(ultimo_semestre['RATIO']) else f"{ultimo_semestre['RATIO'] - 1:+.1%} vs semestre anterior",
+                delta_color='inverse',
+                help=f"Objetivo: menos de {formatear(ultimo_semestre['OBJETIVO'])} casos" if pd.notna(ultimo_semestre['OBJETIVO']) else None,
+            )
+        with indicadores[1]:
+            st.metric(
+                f"Víctimas en moto en {int(ultimo_año['AAAA'])}",
+                formatear(ultimo_año['ACTUAL']),
+                None if pd.isna(ultimo_año['RATIO']) else f"{ultimo_año['RATIO'] - 1:+.1%} vs año anterior",
+                delta_color='inverse',
+                help=f"Objetivo: menos de {formatear(ultimo_año['OBJETIVO'])} casos" if pd.notna(ultimo_año['OBJETIVO']) else None,
+            )
+
+        kpi_por_comuna(selecciones, ultimo_semestre)
+
+
+    # Scatter Plot --------------------------------------------------------------------------------------------------------
+    with metricas.tramo('siniestros.grafico_por_año'):
+        st.plotly_chart(tablero.figura('por_año'),use_container_width=True)
+
+
+
+    # Creo dos columnas
+    superior = st.columns(2)
+
+    with superior[0]: # Map Plot ------------------------------------------------------------------------------------------
+        # Con pocos casos dibujo cada siniestro, si no, las celdas de la grilla
+        with metricas.tramo('siniestros.grafico_mapa'):
+            st.plotly_chart(tablero.figura('mapa'),use_container_width=True)
+
+
+    with superior[1]: # Bar Chart --------------------------------------------------------------------------------------
+        with metricas.tramo('siniestros.grafico_por_comuna'):
+            st.plotly_chart(tablero.figura('por_comuna'))
+
+
+
+    # Creo dos columnas
+    inferior = st.columns(2)
+
+    with inferior[0]: # Pie Plot ---------------------------------------------------------------------------------------
+        with metricas.tramo('siniestros.grafico_sexo'):
+            st.plotly_chart(tablero.figura('sexo'))
+
+
+    with inferior[1]: # Bar Plot ---------------------------------------------------------------------------------------
+        with metricas.tramo('siniestros.grafico_semestres'):
+            st.plotly_chart(tablero.figura('semestres'), use_container_width=True)
+
+    metricas.registrar_desde('siniestros.dashboard', inicio_dashboard)
+
+
+# Consultas espaciales ------------------------------------------------------------------------------------------------
+@st.fragment
+def consultas_espaciales():
+    with st.expander("Consultas espaciales"):
+        st.write("Hechos cercanos a un punto, zonas con más siniestros y comuna estimada de los hechos sin comuna")
+        if streaming.activo():
+            st.caption(f"Se consultan las primeras {streaming.FILAS_MUESTRA} filas del dataset")
+
+        # Zonas con más hechos (cada zona suma una celda de la grilla y sus vecinas)
+        with metricas.tramo('siniestros.espacial_hotspots'):
+            zonas = espacial.indice.hotspots(5)
+        zonas['pos x'], zonas['pos y'] = espacial.proyeccion.a_grados(zonas['x'], zonas['y'])
 
+        # El punto de consulta arranca en la zona con más hechos
+        consulta = st.columns(4)
+        with consulta[0]:
+            lon = st.number_input("Longitud", value=round(float(zonas['pos x'].iloc[0]), 5), format="%.5f", step=0.001, key='espacial_lon')
+        with consulta[1]:
+            lat = st.number_input("Latitud", value=round(float(zonas['pos y'].iloc[0]), 5), format="%.5f", step=0.001, key='espacial_lat')
+        with consulta[2]:
+            radio = st.slider("Radio (m)", 100, 3000, 500, step=100, key='espacial_radio')
+        with consulta[3]:
+            k = st.slider("Vecinos más cercanos", 1, 20, 5, key='espacial_k')
 
+        x_consulta, y_consulta = (valor[0] for valor in espacial.proyeccion.a_metros(lon, lat))
+        with metricas.tramo('siniestros.espacial_consultas'):
+            filas_radio, _ = espacial.indice.en_radio(x_consulta, y_consulta, radio)
+            filas_vecinos, distancias = espacial.indice.vecinos(x_consulta, y_consulta, k)
 
-# Creo dos columnas
-superior = st.columns(2) 
+        st.write(f"**{len(filas_radio)}** hechos a menos de {radio} m del punto")
+        columnas_hecho = ['ID', 'FECHA', 'LUGAR_DEL_HECHO', 'COMUNA', 'VICTIMA', 'ACUSADO']
+        st.dataframe(
+            hechos.iloc[filas_vecinos][columnas_hecho].assign(DISTANCIA=distancias),
+            hide_index=True,
+            column_config={"DISTANCIA": st.column_config.NumberColumn("DISTANCIA (m)", format="%.0f")},
+        )
 
-with superior[0]: # Map Plot ----------------------------------------------------------------------------------------------
+        st.write("Zonas con más hechos")
+        st.dataframe(zonas[['pos x', 'pos y', 'CASOS']], hide_index=True)
 
-    Años = df_filtrado['AAAA']
+        # Comuna de los hechos sin comuna, votada por los hechos más cercanos
+        if len(espacial.desconocidas):
+            st.write("Hechos sin comuna")
+            st.dataframe(
+                espacial.sin_comuna(['ID', 'FECHA', 'LUGAR_DEL_HECHO']),
+                hide_index=True,
+                column_config={"COMUNA_ESTIMADA": st.column_config.NumberColumn("COMUNA ESTIMADA", help="Sin valor si el hecho no tiene coordenadas")},
+            )
 
-    # Leo el token del map plot
-    with open('mapbox_token.txt', 'r') as file:
-        token = file.read()
 
-    # Le doy acceso para setear un map plot
-    px.set_mapbox_access_token(token)
-
-    # Creo el gráfico
-    fig = px.scatter_mapbox(
-        df_filtrado,
-        lat="pos y",
-        lon="pos x",
-        color="VICTIMA",
-        color_continuous_scale=px.colors.sequential.Rainbow,
-        size_max=15,
-        zoom=10,
-        title='Lugares de los siniestros'
-        )
-    
-    # Muestro el gráfico
-    st.plotly_chart(fig,use_container_width=True)
-
-
-with superior[1]: # Bar Chart ------------------------------------------------------------------------------------------
-    if df_filtrado is None or len(df_filtrado) == 0:
-        
-        # Creo un gráfico vacío
-        fig = px.bar(title="Siniestros por comuna")
-        
-        fig.update_layout(
-            yaxis_title='CONTEO',
-            xaxis_title='COMUNA',
-            width=600)
-        
-        st.plotly_chart(fig) 
-        
-    else:
-        conteo_comunas = df_filtrado['COMUNA'].value_counts().sort_index()
-        
-        fig = px.bar(
-            y=conteo_comunas.values,
-            x=conteo_comunas.index,
-            title="Siniestros por comuna")
-        
-        fig.update_layout(
-            yaxis_title='CONTEO',
-            xaxis_title='COMUNA',
-            width=600)
-        
-        st.plotly_chart(fig)
-
-
-
-# Creo dos columnas
-inferior = st.columns(2)
-
-with inferior[0]: # Pie Plot -------------------------------------------------------------------------------------------
-    
-    if df_filtrado is None or len(df_filtrado) == 0:
-        # Creo un gráfico vacío
-        fig = px.pie(title="Siniestros por comuna")
-        st.plotly_chart(fig)
-        
-    else:   
-        conteo_sexo = df_filtrado['SEXO'].value_counts()
-        
-        fig = px.pie(
-            values=conteo_sexo.values,
-            names=conteo_sexo.index,
-            hole=.3,
-            title="Sexo de las víctimas")
-        
-        fig.update_layout(
-            width=600,
-            height=400)
-        
-        st.plotly_chart(fig)
-  
-   
-with inferior[1]: # Bar Plot -------------------------------------------------------------------------------------------
-    
-    fig = px.bar(
-        df_filtrado,
-        x='AAAA',
-        y=['SEM_1','SEM_2'],
-        title='Casos por semestres a lo largo de los años')
-    
-    st.plotly_chart(fig, use_container_width=True)
+# Leo el token del map plot
+with open('mapbox_token.txt', 'r') as file:
+    token = file.read()
 
+dashboard()
+consultas_espaciales()
 
 
 #---------------------------------------------------------------------------------------------------------------------
@@ -405,3 +448,9 @@ st.write(
 
         🚀 Ante cualquier consulta no dudes en comunicarte conmigo por mí mail: daantechincuini42@gmail.com
     ''')
+
+# Métricas de la página ----------------------------------------------------------------------------------------------
+metricas.registrar_desde('siniestros.pagina', inicio_pagina)
+metricas.registrar_primera('siniestros.primer_pintado', arranque.INICIO)
+metricas.panel()
+figuras.panel(cache_figuras)
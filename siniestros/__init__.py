@@ -0,0 +1 @@
+# Módulos de soporte para la página de Siniestros Viales
@@ -0,0 +1,271 @@
+import json
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# pyarrow es opcional: sin él se sigue leyendo desde los CSV
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:
+    pa = None
+
+#---------------------------------------------------------------------------------------------------------------------
+# Formato binario (Arrow IPC / Feather v2 sin comprimir, para poder mapearlo en memoria)
+#
+# Los archivos se escriben en un solo bloque y sin nulos en las columnas numéricas,
+# así al leerlos los arrays de pandas son vistas de sólo lectura sobre el archivo
+# mapeado: todas las sesiones, y todos los procesos del servidor que lean los mismos
+# archivos, comparten las mismas páginas de memoria en lugar de tener su copia.
+DIR_BINARIOS = Path(__file__).resolve().parent.parent / 'Datasets' / 'binarios'
+
+# Columnas de texto con pocos valores distintos que se guardan cómo diccionarios
+CATEGORICAS = {
+    'hechos': ['TIPO_DE_CALLE', 'VICTIMA', 'ACUSADO', 'PARTICIPANTES'],
+    'victimas': ['ROL', 'VICTIMA', 'SEXO'],
+    'df_final': ['COMUNA', 'TIPO_DE_CALLE', 'VICTIMA', 'ACUSADO', 'SEXO'],
+}
+
+# Columnas de coordenadas que se guardan cómo números
+COORDENADAS = ['pos x', 'pos y']
+
+# Columna con el ID del hecho en cada archivo (para dar de baja filas en los segmentos)
+COLUMNAS_ID = {'hechos': 'ID', 'victimas': 'ID_hecho', 'df_final': 'ID'}
+
+# Cantidad de segmentos incrementales a partir de la cual se reescribe el archivo base
+MAX_SEGMENTOS = 8
+
+CLAVE_HUELLA = b'siniestros.huella'
+MANIFIESTO = 'manifiesto.json'
+
+# Manifiestos ya leídos, indexados por (ruta, inodo, fecha de modificación)
+_manifiestos = {}
+
+
+def disponible():
+    return pa is not None
+
+
+def ruta_binario(nombre, directorio=None):
+    return Path(directorio or DIR_BINARIOS) / f'{nombre}.arrow'
+
+
+def ruta_segmento(nombre, numero, directorio=None, bajas=False):
+    sufijo = '.bajas' if bajas else ''
+    return Path(directorio or DIR_BINARIOS) / f'{nombre}.{numero:04d}{sufijo}.arrow'
+
+
+def tipar(df, nombre):
+    """Convierte las columnas de texto repetitivas a categóricas y las coordenadas a números."""
+    df = df.copy()
+    for columna in CATEGORICAS.get(nombre, []):
+        if columna in df.columns:
+            df[columna] = df[columna].astype('category')
+    for columna in COORDENADAS:
+        if columna in df.columns and not pd.api.types.is_numeric_dtype(df[columna]):
+            df[columna] = pd.to_numeric(df[columna].str.strip(), errors='coerce')
+    return df
+
+
+def concatenar(frames):
+    """Concatena DataFrames manteniendo categóricas las columnas categóricas.
+
+    Las categorías se unen en orden de aparición, así las del primer frame
+    (por ejemplo, las comunas ya ordenadas) conservan su orden.
+    """
+    frames = [df for df in frames if df is not None]
+    # Las partes vacías no aportan filas ni categorías (y pyarrow las devuelve con categorías object)
+    frames = [df for df in frames if len(df)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+
+    resultado = pd.concat(frames, ignore_index=True)
+    for columna in frames[0].columns:
+        if all(isinstance(df[columna].dtype, pd.CategoricalDtype) for df in frames):
+            unidas = pd.api.types.union_categoricals(_categorias_comunes([df[columna] for df in frames]), ignore_order=True)
+            resultado[columna] = pd.Categorical(unidas, categories=unidas.categories, ordered=frames[0][columna].cat.ordered)
+    return resultado
+
+
+def _categorias_comunes(series):
+    # union_categoricals exige el mismo dtype de categorías. Una columna sin
+    # valores trae categorías object vacías; si no, las paso todas a object.
+    tipos = {serie.cat.categories.dtype for serie in series if len(serie.cat.categories)}
+    tipo = tipos.pop() if len(tipos) == 1 else object
+    return [
+        serie if serie.cat.categories.dtype == tipo else serie.cat.set_categories(serie.cat.categories.astype(tipo))
+        for serie in series
+    ]
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Manifiesto: qué versión de los datos hay guardada y cuántos segmentos tiene cada archivo
+def leer_manifiesto(directorio=None):
+    ruta = Path(directorio or DIR_BINARIOS) / MANIFIESTO
+    try:
+        info = ruta.stat()
+        clave = (str(ruta), info.st_ino, info.st_mtime_ns)
+    except OSError:
+        return None
+    if clave not in _manifiestos:
+        _manifiestos[clave] = json.loads(ruta.read_text(encoding='utf-8'))
+    return _manifiestos[clave]
+
+
+def escribir_manifiesto(manifiesto, directorio=None):
+    ruta = Path(directorio or DIR_BINARIOS) / MANIFIESTO
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.json.tmp')
+    temporal.write_text(json.dumps(manifiesto, indent=2), encoding='utf-8')
+    temporal.replace(ruta)
+
+
+def huella_vigente(huella_fuentes, directorio=None):
+    """Devuelve la huella de los datos guardados si se derivan de `huella_fuentes` (por ejemplo, con deltas aplicados)."""
+    manifiesto = leer_manifiesto(directorio)
+    if manifiesto and manifiesto.get('base') == huella_fuentes:
+        return manifiesto['huella']
+    return huella_fuentes
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Escritura
+def _escribir_tabla(df, ruta, huella):
+    # Los ID tienen casi un valor por fila: cómo texto se leen sin copiar, cómo diccionario no
+    ids = [columna for columna in set(COLUMNAS_ID.values()) if columna in df.columns]
+    if ids:
+        df = df.astype({columna: str for columna in ids})
+    tabla = pa.Table.from_pandas(df, preserve_index=False)
+
+    # Los nulos de las columnas flotantes se guardan cómo NaN para no tener que rellenarlos al leer
+    for i, campo in enumerate(tabla.schema):
+        if pa.types.is_floating(campo.type) and tabla.column(i).null_count:
+            tabla = tabla.set_column(i, campo, pc.fill_null(tabla.column(i), float('nan')))
+
+    metadatos = dict(tabla.schema.metadata or {})
+    metadatos[CLAVE_HUELLA] = huella.encode()
+    tabla = tabla.replace_schema_metadata(metadatos)
+
+    # Escribo en un archivo temporal y lo renombro para no dejar archivos a medias
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.arrow.tmp')
+    feather.write_feather(tabla, temporal, compression='uncompressed', chunksize=max(len(tabla), 1))
+    temporal.replace(ruta)
+    return ruta
+
+
+def escribir(df, nombre, huella, directorio=None):
+    """Guarda `df` en formato Arrow IPC junto a la huella de los CSV de origen."""
+    return _escribir_tabla(df, ruta_binario(nombre, directorio), huella)
+
+
+def escribir_binarios(hechos, victimas, df_final, huella, directorio=None):
+    escribir(tipar(hechos, 'hechos'), 'hechos', huella, directorio)
+    escribir(tipar(victimas, 'victimas'), 'victimas', huella, directorio)
+    escribir(df_final, 'df_final', huella, directorio)
+
+    # Una reconstrucción completa descarta los segmentos y agregados anteriores
+    escribir_manifiesto({'base': huella, 'huella': huella, 'segmentos': {}, 'deltas': []}, directorio)
+
+
+def agregar_segmento(df, bajas, nombre, manifiesto, directorio=None):
+    """Agrega un segmento incremental a `nombre`: las filas de `df` reemplazan a las de los IDs en `bajas`.
+
+    Sólo se escriben las filas nuevas; el manifiesto lo actualiza quien llama.
+    """
+    numero = manifiesto['segmentos'].get(nombre, 0) + 1
+    _escribir_tabla(df, ruta_segmento(nombre, numero, directorio), manifiesto['huella'])
+    _escribir_tabla(pd.DataFrame({'ID': pd.Series(list(bajas), dtype=str)}),
+                    ruta_segmento(nombre, numero, directorio, bajas=True), manifiesto['huella'])
+    manifiesto['segmentos'][nombre] = numero
+
+
+def compactar(df, nombre, manifiesto, directorio=None):
+    """Reescribe el archivo base con todo el contenido y descarta los segmentos."""
+    escribir(df, nombre, manifiesto['huella'], directorio)
+    for numero in range(1, manifiesto['segmentos'].get(nombre, 0) + 1):
+        ruta_segmento(nombre, numero, directorio).unlink(missing_ok=True)
+        ruta_segmento(nombre, numero, directorio, bajas=True).unlink(missing_ok=True)
+    manifiesto['segmentos'][nombre] = 0
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Lectura
+def _leer_tabla(ruta, columna=None, ids=None):
+    tabla = feather.read_table(ruta, memory_map=True)
+    if ids is not None:
+        # Filtro sobre el archivo mapeado, así sólo se convierten a pandas las filas pedidas
+        tabla = tabla.filter(pc.is_in(tabla[columna].cast(pa.string()), value_set=ids))
+    # split_blocks evita consolidar las columnas en bloques nuevos (y copiarlas)
+    return tabla.to_pandas(split_blocks=True)
+
+
+def leer(nombre, directorio=None, ids=None):
+    """Lee el archivo base de `nombre` y le aplica sus segmentos incrementales en orden.
+
+    Con `ids` se devuelven sólo las filas de esos hechos.
+    """
+    columna = COLUMNAS_ID.get(nombre, 'ID')
+    if ids is not None:
+        ids = pa.array(list(ids), type=pa.string())
+    df = _leer_tabla(ruta_binario(nombre, directorio), columna, ids)
+
+    manifiesto = leer_manifiesto(directorio) or {}
+    segmentos = manifiesto.get('segmentos', {}).get(nombre, 0)
+    if segmentos:
+        partes = [df]
+        for numero in range(1, segmentos + 1):
+            # Las bajas de un segmento sólo afectan a las filas anteriores a él
+            bajas = _leer_tabla(ruta_segmento(nombre, numero, directorio, bajas=True))['ID']
+            partes = [parte[~parte[columna].astype(str).isin(bajas)] for parte in partes]
+            partes.append(_leer_tabla(ruta_segmento(nombre, numero, directorio), columna, ids))
+        df = concatenar(partes)
+    return df
+
+
+def leer_binarios(huella, directorio=None):
+    """Devuelve `(hechos, victimas, df_final)` si los binarios están al día, o None si no."""
+    if not disponible():
+        return None
+    manifiesto = leer_manifiesto(directorio)
+    if not manifiesto or manifiesto.get('huella') != huella:
+        return None
+    try:
+        return tuple(leer(nombre, directorio) for nombre in ['hechos', 'victimas', 'df_final'])
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+def leer_agregado(nombre, huella, directorio=None):
+    """Lee un agregado guardado (por ejemplo el cubo) si corresponde a la versión `huella`."""
+    if not disponible():
+        return None
+    manifiesto = leer_manifiesto(directorio)
+    if not manifiesto or manifiesto.get('huella') != huella or nombre not in manifiesto.get('agregados', []):
+        return None
+    try:
+        return _leer_tabla(ruta_binario(nombre, directorio))
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Paso de construcción: python -m siniestros.almacenamiento
+def construir():
+    from siniestros import etl
+
+    if not disponible():
+        sys.exit('Se necesita pyarrow para construir los binarios')
+
+    directorio = etl.dir_datos() / 'binarios'
+    huella = etl.huella_fuentes_version()
+    hechos, victimas = etl.leer_csv()
+    df_final = etl.construir_df_final(hechos, victimas)
+    escribir_binarios(hechos, victimas, df_final, huella, directorio)
+    print(f'Binarios escritos en {directorio} (huella {huella})')
+
+
+if __name__ == '__main__':
+    construir()
@@ -0,0 +1,143 @@
+"""Arranque rápido del servidor: importaciones diferidas y precalentamiento de las cachés.
+
+Uso (desde la raíz del repositorio):
+    python -m siniestros.arranque                          # precalienta y levanta el servidor
+    python -m siniestros.arranque --server.port 8502       # los argumentos extra van a `streamlit run`
+    python -m siniestros.arranque --sin-servidor           # sólo construye los binarios y mide las importaciones
+
+Este módulo sólo importa streamlit: pandas, numpy, plotly y el ETL se importan en
+el hilo de precalentamiento, fuera del camino de la primera página.
+"""
+import argparse
+import importlib
+import sys
+import threading
+import time
+from pathlib import Path
+
+import streamlit as st
+
+from siniestros import metricas
+
+RAIZ = Path(__file__).resolve().parent.parent
+PAGINA_INICIO = RAIZ / 'Inicio.py'
+TOKEN_MAPA = RAIZ / 'mapbox_token.txt'
+
+# Momento de arranque del proceso. Con `streamlit run` es la primera vez que se importa este módulo.
+INICIO = time.perf_counter()
+
+# Módulos que tardan en importarse y que sólo necesita la página de Siniestros Viales
+MODULOS_PESADOS = ['numpy', 'pandas', 'pyarrow', 'plotly.express', 'siniestros.etl', 'siniestros.graficos']
+
+# Tiempos del último arranque (también se registran en las métricas si están activas)
+tiempos = {}
+
+
+def _medir(nombre, inicio):
+    tiempos[nombre] = time.perf_counter() - inicio
+    if metricas.ACTIVO:
+        metricas.registrar(nombre, tiempos[nombre])
+
+
+def importar_modulos(modulos=MODULOS_PESADOS):
+    """Importa los módulos pesados midiendo cuánto tarda cada uno."""
+    for modulo in modulos:
+        inicio = time.perf_counter()
+        try:
+            importlib.import_module(modulo)
+        except ImportError:
+            # pyarrow es opcional
+            continue
+        _medir(f'arranque.import.{modulo}', inicio)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Precalentamiento
+def precalentar():
+    """Carga el dataset, las estructuras precalculadas y las figuras con los filtros por defecto."""
+    inicio_total = time.perf_counter()
+    importar_modulos()
+
+    from siniestros import etl, figuras, streaming
+    from siniestros.cubo import cargar_cubo
+    from siniestros.espacial import cargar_espacial
+    from siniestros.etl import cargar_datos
+    from siniestros.indice import DIMENSIONES, cargar_indice
+    from siniestros.kpi import cargar_kpi
+    from siniestros.mapa import cargar_piramide
+    from siniestros.visor import cargar_visor
+
+    # Mismas cargas que hace la página, así quedan en las cachés compartidas
+    inicio = time.perf_counter()
+    if streaming.activo():
+        hechos, victimas = streaming.cargar_muestras()
+        agregados = streaming.cargar_agregados()
+        df_final = None
+        cubo, piramide = agregados.cubo, agregados.piramide
+        indice = cubo.indice
+    else:
+        hechos, victimas, df_final = cargar_datos()
+        indice = cargar_indice(df_final)
+        cubo = cargar_cubo(df_final)
+        piramide = cargar_piramide(df_final)
+        cargar_kpi(df_final)
+    cargar_espacial(hechos)
+    cargar_visor('hechos', hechos)
+    cargar_visor('victimas', victimas)
+    _medir('arranque.datos', inicio)
+
+    # Figuras de lo que ve el primer visitante: todos los valores de cada filtro seleccionados.
+    # Quedan en la caché de figuras con las mismas claves que usa la página.
+    inicio = time.perf_counter()
+    selecciones = {dimension: list(indice.valores[dimension]) for dimension in DIMENSIONES}
+    token = TOKEN_MAPA.read_text() if TOKEN_MAPA.exists() else ''
+    figuras.FigurasDashboard(
+        selecciones, cubo, piramide, token, df_final, indice,
+        huella=etl.huella_version(), cache=figuras.cargar_figuras(),
+    ).todas()
+    _medir('arranque.figuras', inicio)
+
+    _medir('arranque.precalentamiento', inicio_total)
+
+
+@st.cache_resource(show_spinner=False)
+def iniciar_precalentamiento():
+    """Lanza `precalentar` en un hilo de fondo. Por la caché corre una sola vez por proceso."""
+    hilo = threading.Thread(target=precalentar, name='siniestros-precalentamiento', daemon=True)
+    hilo.start()
+    return hilo
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Línea de comandos
+def construir():
+    """Deja listos los binarios (y mide las importaciones) sin levantar el servidor."""
+    importar_modulos()
+    from siniestros import etl
+
+    inicio = time.perf_counter()
+    etl.cargar_datos()
+    _medir('arranque.datos', inicio)
+    for nombre, segundos in tiempos.items():
+        print(f'{nombre:<36} {segundos:8.3f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Levanta el dashboard con las cachés precalentadas')
+    parser.add_argument('--sin-servidor', action='store_true', help='sólo construir los binarios y medir las importaciones')
+    args, resto = parser.parse_known_args()
+
+    if args.sin_servidor:
+        construir()
+        sys.exit()
+
+    # El precalentamiento arranca junto con el servidor, antes del primer visitante.
+    # Uso el módulo importado (no __main__) para compartir la caché con las páginas.
+    from siniestros import arranque
+
+    arranque.iniciar_precalentamiento()
+
+    from streamlit.web import cli
+
+    sys.argv = ['streamlit', 'run', str(PAGINA_INICIO), *resto]
+    sys.exit(cli.main())
@@ -0,0 +1,64 @@
+import streamlit as st
+
+from siniestros import almacenamiento, etl
+from siniestros.indice import IndiceFiltros
+
+#---------------------------------------------------------------------------------------------------------------------
+# Cubo de conteos pre-agregado
+DIMENSIONES_CUBO = ['AAAA', 'MM', 'COMUNA', 'GRUPO ETARIO', 'TIPO_DE_CALLE', 'SEXO', 'VICTIMA']
+
+
+def agregar(df, dimensiones=DIMENSIONES_CUBO):
+    """Cuenta las filas de `df` por cada combinación de dimensiones (una celda por combinación)."""
+    celdas = df.groupby(dimensiones, observed=True, dropna=False).size()
+    return celdas.rename('CASOS').reset_index()
+
+
+class CuboConteos:
+    """Conteos de `df_final` por celda, con un índice de filtros sobre las celdas.
+
+    Los gráficos se resuelven sumando las celdas filtradas, por lo que el costo
+    depende de la cantidad de celdas y no de la cantidad de siniestros.
+    """
+
+    def __init__(self, celdas):
+        self.celdas = celdas.reset_index(drop=True)
+        self.indice = IndiceFiltros(self.celdas)
+
+    @classmethod
+    def desde_df(cls, df):
+        return cls(agregar(df))
+
+    def filtrar(self, selecciones):
+        return self.celdas[self.indice.mascara(selecciones)]
+
+    # Roll-ups que usa el dashboard -----------------------------------------------------------------------------------
+    @staticmethod
+    def sumar_por(celdas, dimension):
+        conteo = celdas.groupby(dimension, observed=True)['CASOS'].sum().sort_index()
+        return conteo[conteo > 0]
+
+    @staticmethod
+    def por_semestre(celdas):
+        # Cuento los casos de cada semestre por año
+        semestres = celdas.assign(
+            SEM_1=celdas['CASOS'].where(celdas['MM'] <= 6, 0),
+            SEM_2=celdas['CASOS'].where(celdas['MM'] > 6, 0),
+        )
+        return semestres.groupby('AAAA')[['SEM_1', 'SEM_2']].sum().reset_index()
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _cubo_version(huella, _df_final):
+    # Si la actualización incremental dejó el cubo guardado para esta versión, lo uso
+    celdas = almacenamiento.leer_agregado('cubo', huella, etl.dir_datos() / 'binarios')
+    if celdas is not None:
+        return CuboConteos(celdas)
+    return CuboConteos.desde_df(_df_final)
+
+
+def cargar_cubo(df_final, huella=None):
+    """Devuelve el cubo de conteos de la versión actual de `df_final`."""
+    return _cubo_version(huella or etl.huella_version(), df_final)
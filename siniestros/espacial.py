@@ -0,0 +1,221 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from siniestros import etl
+
+#---------------------------------------------------------------------------------------------------------------------
+# Índice espacial de los hechos
+#
+# Las consultas se hacen en las coordenadas proyectadas de `XY (CABA)` (metros).
+# Los hechos sin esa columna pero con `pos x`/`pos y` se proyectan con una
+# transformación afín ajustada sobre los hechos que tienen ambas.
+
+# Lado de cada celda de la grilla, en metros
+TAMAÑO_CELDA = 250
+
+# Cantidad de vecinos que votan la comuna de un hecho sin comuna
+K_COMUNA = 5
+
+_PATRON_PUNTO = r'Point\s*\(\s*(\S+)\s+([^\s)]+)\s*\)'
+
+
+def parsear_puntos(serie):
+    """Convierte una columna de WKT `Point (x y)` en dos arrays de floats (NaN si el punto no es válido)."""
+    partes = serie.astype(str).str.extract(_PATRON_PUNTO)
+    x = pd.to_numeric(partes[0], errors='coerce').to_numpy(dtype=float, copy=True)
+    y = pd.to_numeric(partes[1], errors='coerce').to_numpy(dtype=float, copy=True)
+    return x, y
+
+
+class Proyeccion:
+    """Transformación afín entre grados (lon, lat) y metros (XY CABA), ajustada por mínimos cuadrados.
+
+    En la extensión de la ciudad la diferencia con la proyección real es de unos pocos metros.
+    """
+
+    def __init__(self, lon, lat, x, y):
+        validos = ~(np.isnan(lon) | np.isnan(lat) | np.isnan(x) | np.isnan(y))
+        if validos.sum() < 3:
+            raise ValueError('Se necesitan al menos tres puntos con ambas coordenadas')
+        grados = np.column_stack([lon[validos], lat[validos], np.ones(validos.sum())])
+        metros = np.column_stack([x[validos], y[validos], np.ones(validos.sum())])
+        self.a_metros_coef = np.linalg.lstsq(grados, metros[:, :2], rcond=None)[0]
+        self.a_grados_coef = np.linalg.lstsq(metros, grados[:, :2], rcond=None)[0]
+
+    def a_metros(self, lon, lat):
+        resultado = np.column_stack([np.atleast_1d(lon), np.atleast_1d(lat), np.ones(np.size(lon))]) @ self.a_metros_coef
+        return resultado[:, 0], resultado[:, 1]
+
+    def a_grados(self, x, y):
+        resultado = np.column_stack([np.atleast_1d(x), np.atleast_1d(y), np.ones(np.size(x))]) @ self.a_grados_coef
+        return resultado[:, 0], resultado[:, 1]
+
+
+def coordenadas(hechos):
+    """Devuelve `(x, y, proyeccion)` en metros para cada hecho, completando con `pos x`/`pos y`."""
+    x, y = parsear_puntos(hechos['XY (CABA)'])
+    lon = etl.limpiar_y_convertir(hechos['pos x']).to_numpy(dtype=float)
+    lat = etl.limpiar_y_convertir(hechos['pos y']).to_numpy(dtype=float)
+
+    proyeccion = Proyeccion(lon, lat, x, y)
+    faltantes = np.isnan(x) & ~(np.isnan(lon) | np.isnan(lat))
+    if faltantes.any():
+        x[faltantes], y[faltantes] = proyeccion.a_metros(lon[faltantes], lat[faltantes])
+    return x, y, proyeccion
+
+
+class IndiceEspacial:
+    """Grilla regular sobre los puntos, con los puntos ordenados por celda.
+
+    Cada celda es un tramo contiguo de los arrays ordenados (`inicios` marca dónde
+    empieza), así una consulta sólo mira las celdas que tocan el área buscada.
+    Las posiciones que devuelven las consultas son las de los puntos originales.
+    """
+
+    def __init__(self, x, y, tamaño=TAMAÑO_CELDA):
+        validos = ~(np.isnan(x) | np.isnan(y))
+        filas = np.flatnonzero(validos)
+        x, y = x[validos], y[validos]
+        if not len(x):
+            raise ValueError('No hay puntos con coordenadas')
+
+        self.tamaño = tamaño
+        self.origen = (x.min(), y.min())
+        celda_x = ((x - self.origen[0]) // tamaño).astype(np.int64)
+        celda_y = ((y - self.origen[1]) // tamaño).astype(np.int64)
+        self.nx, self.ny = int(celda_x.max()) + 1, int(celda_y.max()) + 1
+
+        claves = celda_x * self.ny + celda_y
+        orden = np.argsort(claves, kind='stable')
+        self.x, self.y, self.filas = x[orden], y[orden], filas[orden]
+        self.inicios = np.searchsorted(claves[orden], np.arange(self.nx * self.ny + 1))
+        self.conteos = np.diff(self.inicios).reshape(self.nx, self.ny)
+
+    def __len__(self):
+        return len(self.x)
+
+    def _celda(self, x, y):
+        return int((x - self.origen[0]) // self.tamaño), int((y - self.origen[1]) // self.tamaño)
+
+    def _candidatos(self, x, y, radio):
+        # Posiciones (en los arrays ordenados) de los puntos de las celdas que tocan el cuadrado de lado 2 * radio.
+        # Las celdas de una misma columna de la grilla son contiguas, así que alcanza con un tramo por columna.
+        x0, y0 = self._celda(x - radio, y - radio)
+        x1, y1 = self._celda(x + radio, y + radio)
+        x0, x1 = max(x0, 0), min(x1, self.nx - 1)
+        y0, y1 = max(y0, 0), min(y1, self.ny - 1)
+        if x0 > x1 or y0 > y1:
+            return np.empty(0, dtype=np.int64)
+        tramos = [
+            np.arange(self.inicios[cx * self.ny + y0], self.inicios[cx * self.ny + y1 + 1])
+            for cx in range(x0, x1 + 1)
+        ]
+        return np.concatenate(tramos)
+
+    def en_radio(self, x, y, radio):
+        """Puntos a menos de `radio` metros de (x, y). Devuelve `(filas, distancias)` ordenados por distancia."""
+        candidatos = self._candidatos(x, y, radio)
+        distancias = np.hypot(self.x[candidatos] - x, self.y[candidatos] - y)
+        dentro = distancias <= radio
+        candidatos, distancias = candidatos[dentro], distancias[dentro]
+        orden = np.argsort(distancias, kind='stable')
+        return self.filas[candidatos[orden]], distancias[orden]
+
+    def vecinos(self, x, y, k):
+        """Los `k` puntos más cercanos a (x, y). Devuelve `(filas, distancias)` ordenados por distancia."""
+        k = min(k, len(self))
+        radio = self.tamaño
+        while True:
+            candidatos = self._candidatos(x, y, radio)
+            distancias = np.hypot(self.x[candidatos] - x, self.y[candidatos] - y)
+            # Los puntos a menos de `radio` seguro están entre los candidatos;
+            # si hay k de ellos ya son los k más cercanos.
+            if (distancias <= radio).sum() >= k or len(candidatos) == len(self):
+                break
+            radio *= 2
+
+        orden = np.argsort(distancias, kind='stable')[:k]
+        return self.filas[candidatos[orden]], distancias[orden]
+
+    def hotspots(self, n=5, radio_celdas=1):
+        """Las `n` zonas con más hechos, sumando cada celda con sus vecinas a `radio_celdas` celdas.
+
+        Devuelve un DataFrame con el centro de cada zona (x, y) y la cantidad de casos.
+        Una zona elegida descarta a las que se superponen con ella.
+        """
+        # Suma de cada ventana de (2r+1) x (2r+1) celdas con una imagen integral
+        ancho = 2 * radio_celdas + 1
+        relleno = np.pad(self.conteos, radio_celdas)
+        integral = np.pad(relleno.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        densidad = (
+            integral[ancho:, ancho:] - integral[:-ancho, ancho:]
+            - integral[ancho:, :-ancho] + integral[:-ancho, :-ancho]
+        )
+
+        zonas = []
+        densidad = densidad.astype(float)
+        for _ in range(n):
+            cx, cy = np.unravel_index(np.argmax(densidad), densidad.shape)
+            if densidad[cx, cy] <= 0:
+                break
+            zonas.append({
+                'x': self.origen[0] + (cx + 0.5) * self.tamaño,
+                'y': self.origen[1] + (cy + 0.5) * self.tamaño,
+                'CASOS': int(densidad[cx, cy]),
+            })
+            densidad[max(cx - 2 * radio_celdas, 0):cx + 2 * radio_celdas + 1, max(cy - 2 * radio_celdas, 0):cy + 2 * radio_celdas + 1] = -1
+        return pd.DataFrame(zonas, columns=['x', 'y', 'CASOS'])
+
+
+def estimar_comunas(comunas, x, y, desconocidas, k=K_COMUNA):
+    """Asigna a cada posición de `desconocidas` la comuna más votada entre sus `k` vecinos con comuna conocida.
+
+    Devuelve una Serie indexada por posición; las que no tienen coordenadas quedan sin estimar.
+    """
+    comunas = np.asarray(comunas)
+    if not len(desconocidas):
+        return pd.Series(dtype='Int64')
+    conocidas = np.ones(len(comunas), dtype=bool)
+    conocidas[desconocidas] = False
+    indice = IndiceEspacial(np.where(conocidas, x, np.nan), np.where(conocidas, y, np.nan))
+
+    estimadas = {}
+    for posicion in desconocidas:
+        if np.isnan(x[posicion]) or np.isnan(y[posicion]):
+            continue
+        filas, _ = indice.vecinos(x[posicion], y[posicion], k)
+        valores, votos = np.unique(comunas[filas], return_counts=True)
+        estimadas[posicion] = valores[np.argmax(votos)]
+    return pd.Series(estimadas, index=pd.Index(list(estimadas), dtype=np.int64), dtype='Int64')
+
+
+class ConsultasEspaciales:
+    """Índice espacial de los hechos junto con su proyección y las comunas estimadas."""
+
+    def __init__(self, hechos, tamaño=TAMAÑO_CELDA):
+        self.hechos = hechos
+        self.x, self.y, self.proyeccion = coordenadas(hechos)
+        self.indice = IndiceEspacial(self.x, self.y, tamaño)
+
+        comunas = hechos['COMUNA'].to_numpy()
+        self.desconocidas = np.flatnonzero(comunas == 0)
+        self.comunas_estimadas = estimar_comunas(comunas, self.x, self.y, self.desconocidas)
+
+    def sin_comuna(self, columnas):
+        """Hechos sin comuna con la comuna estimada (nula si el hecho no tiene coordenadas)."""
+        return self.hechos.iloc[self.desconocidas][columnas].assign(
+            COMUNA_ESTIMADA=self.comunas_estimadas.reindex(self.desconocidas).to_numpy()
+        )
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _espacial_version(huella, _hechos):
+    return ConsultasEspaciales(_hechos)
+
+
+def cargar_espacial(hechos, huella=None):
+    """Devuelve las consultas espaciales de la versión actual de `hechos`."""
+    return _espacial_version(huella or etl.huella_version(), hechos)
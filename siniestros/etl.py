@@ -0,0 +1,329 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import streamlit as st
+import pandas as pd
+
+from siniestros import almacenamiento, metricas
+
+#---------------------------------------------------------------------------------------------------------------------
+# Rutas de los Datasets
+DIR_DATOS = Path(__file__).resolve().parent.parent / 'Datasets'
+
+
+def dir_datos():
+    # SINIESTROS_DATOS permite apuntar a otra carpeta, por ejemplo a datos sintéticos
+    return Path(os.environ.get('SINIESTROS_DATOS', DIR_DATOS))
+
+
+def rutas(ruta_hechos=None, ruta_victimas=None):
+    """Completa las rutas que no se pasan con las de la carpeta de datos actual."""
+    return ruta_hechos or dir_datos() / 'Hechos.csv', ruta_victimas or dir_datos() / 'Victimas.csv'
+
+
+# Versión del Mini ETL: si cambia la lógica se incrementa para invalidar los binarios
+VERSION_ETL = 3
+
+# Cantidad máxima de versiones de los datasets que se guardan en caché
+MAX_VERSIONES = 2
+
+# Huellas ya calculadas, indexadas por (ruta, tamaño, fecha de modificación)
+_huellas = {}
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Huella de contenido
+def huella_archivo(ruta):
+    """Devuelve el hash SHA-256 del contenido de un archivo.
+
+    El hash se recalcula sólo cuando cambia el tamaño o la fecha de modificación
+    del archivo, por lo que en un rerun sólo se hace un `stat`.
+    """
+    info = os.stat(ruta)
+    clave = (str(ruta), info.st_size, info.st_mtime_ns)
+
+    if clave not in _huellas:
+        sha = hashlib.sha256()
+        with open(ruta, 'rb') as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b''):
+                sha.update(bloque)
+        _huellas[clave] = sha.hexdigest()
+
+    return _huellas[clave]
+
+
+def huella_fuentes(ruta_hechos=None, ruta_victimas=None):
+    """Combina las huellas de ambos datasets en una sola."""
+    ruta_hechos, ruta_victimas = rutas(ruta_hechos, ruta_victimas)
+    return hashlib.sha256(
+        (huella_archivo(ruta_hechos) + huella_archivo(ruta_victimas)).encode()
+    ).hexdigest()[:16]
+
+
+def huella_fuentes_version(ruta_hechos=None, ruta_victimas=None):
+    """Huella de los CSV más la versión del ETL que produjo `df_final`."""
+    ruta_hechos, ruta_victimas = rutas(ruta_hechos, ruta_victimas)
+    return f'{huella_fuentes(ruta_hechos, ruta_victimas)}-v{VERSION_ETL}'
+
+
+def huella_version(ruta_hechos=None, ruta_victimas=None):
+    """Huella de la versión vigente de los datos.
+
+    Coincide con la de los CSV salvo que se hayan aplicado deltas incrementales
+    sobre ellos (ver `siniestros.incremental`).
+    """
+    ruta_hechos, ruta_victimas = rutas(ruta_hechos, ruta_victimas)
+    huella = huella_fuentes_version(ruta_hechos, ruta_victimas)
+    return almacenamiento.huella_vigente(huella, Path(ruta_hechos).parent / 'binarios')
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Mini ETL
+def leer_csv(ruta_hechos=None, ruta_victimas=None):
+    """Lee ambos CSV con los mismos tipos que los binarios y los valores SD ya cómo nulos."""
+    ruta_hechos, ruta_victimas = rutas(ruta_hechos, ruta_victimas)
+    hechos = sin_dato_a_nulo(almacenamiento.tipar(pd.read_csv(ruta_hechos), 'hechos'))
+    victimas = sin_dato_a_nulo(almacenamiento.tipar(pd.read_csv(ruta_victimas), 'victimas'))
+    return hechos, victimas
+
+
+def limpiar_y_convertir(columna):
+    # Las coordenadas ya pueden venir numéricas desde los binarios
+    if pd.api.types.is_numeric_dtype(columna):
+        return columna
+    # Eliminar espacios y valores no numéricos que consisten solo en '.'
+    columna = columna.str.strip().replace('.', '')
+    # Reemplazar valores vacíos o no válidos con NaN
+    columna = pd.to_numeric(columna, errors='coerce')
+    return columna
+
+
+# Columnas que se usan de cada dataset
+COLUMNAS_HECHOS = ['ID', 'COMUNA', 'TIPO_DE_CALLE', 'AAAA','MM','HH', 'VICTIMA', 'ACUSADO', 'pos x', 'pos y']
+COLUMNAS_VICTIMAS = ['ID_hecho', 'SEXO', 'EDAD']
+
+# Rangos y nombres de los grupos etarios
+BINS_EDAD = [0, 12, 18, 35, 50, 65, 100]
+GRUPOS_ETARIOS = ['Niño', 'Adolescente', 'Joven Adulto', 'Adulto', 'Adulto Maduro', 'Adulto Mayor']
+
+
+# Cada etapa recibe y devuelve un diccionario con los frames en proceso
+# ('hechos', 'victimas' y, después de la unión, 'df_final').
+def etapa_reducir(datos):
+    # Me quedo sólo con las columnas que necesito y renombro 'ID_hecho'
+    hechos = datos['hechos'][COLUMNAS_HECHOS]
+    victimas = datos['victimas'][COLUMNAS_VICTIMAS].rename(columns={'ID_hecho': 'ID'})
+    return {'hechos': hechos, 'victimas': victimas}
+
+
+def sin_dato_a_nulo(df):
+    # Reemplazo valores SD (Sin Dato) por nulos sin recorrer fila por fila
+    df = df.copy()
+    for columna in df.columns:
+        serie = df[columna]
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            if 'SD' in serie.cat.categories:
+                df[columna] = serie.cat.remove_categories('SD')
+        elif not pd.api.types.is_numeric_dtype(serie):
+            df[columna] = serie.mask(serie == 'SD')
+    return df
+
+
+def etapa_sin_dato(datos):
+    return {'hechos': sin_dato_a_nulo(datos['hechos']), 'victimas': sin_dato_a_nulo(datos['victimas'])}
+
+
+def etapa_codificar_ids(datos):
+    # Codifico los ID de ambos datasets con un mismo diccionario de enteros
+    hechos, victimas = datos['hechos'], datos['victimas']
+    codigos, ids = pd.factorize(pd.concat([hechos['ID'], victimas['ID']], ignore_index=True))
+
+    hechos = hechos.assign(ID=pd.Categorical.from_codes(codigos[:len(hechos)], ids))
+    hechos['_ID'] = codigos[:len(hechos)]
+    victimas = victimas.drop(columns='ID')
+    victimas['_ID'] = codigos[len(hechos):]
+    return {'hechos': hechos, 'victimas': victimas}
+
+
+def etapa_unir(datos):
+    # Merge sobre los códigos enteros para crear el dataset final
+    df_final = pd.merge(datos['hechos'], datos['victimas'], on='_ID', how='inner')
+    return {'df_final': df_final.drop(columns='_ID')}
+
+
+def etapa_grupo_etario(datos):
+    # Creo una columna con el grupo etario en base a 'EDAD' y la elimino
+    df_final = datos['df_final']
+    edad = pd.to_numeric(df_final['EDAD'], errors='coerce')
+    df_final = df_final.drop(columns=['EDAD'])
+    df_final['GRUPO ETARIO'] = pd.cut(edad, bins=BINS_EDAD, labels=GRUPOS_ETARIOS, right=False)
+    return {'df_final': df_final}
+
+
+def etiqueta_comuna(numero):
+    return 'DESCONOCIDO' if numero == 0 else f'COMUNA {int(numero)}'
+
+
+def etapa_comunas(datos):
+    # Ordeno por 'COMUNA' y la convierto en una categórica 'COMUNA n' (la 0 es Desconocido).
+    # Las etiquetas se arman una sola vez por comuna distinta, no por fila.
+    df_final = datos['df_final'].sort_values(by='COMUNA', kind='stable')
+    codigos, numeros = pd.factorize(df_final['COMUNA'], sort=True)
+    etiquetas = [etiqueta_comuna(numero) for numero in numeros]
+    df_final['COMUNA'] = pd.Categorical.from_codes(codigos, etiquetas)
+    return {'df_final': df_final}
+
+
+def etapa_coordenadas(datos):
+    df_final = datos['df_final']
+    df_final['pos y'] = limpiar_y_convertir(df_final['pos y'])
+    df_final['pos x'] = limpiar_y_convertir(df_final['pos x'])
+    return {'df_final': df_final}
+
+
+def etapa_hora(datos):
+    # Cambio los valores nulos a 0 y transformo los valores a enteros
+    df_final = datos['df_final']
+    df_final['HH'] = pd.to_numeric(df_final['HH'], errors='coerce').fillna(0).astype(int)
+    return {'df_final': df_final}
+
+
+def etapa_semestres(datos):
+    # Creo dos columnas para los semestres
+    df_final = datos['df_final']
+    primer_semestre = (df_final['MM'] <= 6).to_numpy()
+    df_final['SEM_1'] = primer_semestre.astype(int)
+    df_final['SEM_2'] = (~primer_semestre).astype(int)
+    return {'df_final': df_final}
+
+
+def etapa_victima(datos):
+    # Cambio los valores nulos por 'DESCONOCIDO'
+    df_final = datos['df_final']
+    victima = df_final['VICTIMA'].astype('category')
+    if 'DESCONOCIDO' not in victima.cat.categories:
+        victima = victima.cat.add_categories('DESCONOCIDO')
+    df_final['VICTIMA'] = victima.fillna('DESCONOCIDO')
+    return {'df_final': df_final}
+
+
+def etapa_tipar(datos):
+    # Guardo las columnas de texto cómo categóricas, sin categorías vacías
+    df_final = almacenamiento.tipar(datos['df_final'], 'df_final')
+    for columna in df_final.select_dtypes('category').columns:
+        df_final[columna] = df_final[columna].cat.remove_unused_categories()
+    return {'df_final': df_final}
+
+
+ETAPAS = [
+    etapa_reducir,
+    etapa_sin_dato,
+    etapa_codificar_ids,
+    etapa_unir,
+    etapa_grupo_etario,
+    etapa_comunas,
+    etapa_coordenadas,
+    etapa_hora,
+    etapa_semestres,
+    etapa_victima,
+    etapa_tipar,
+]
+
+
+def _memoria(datos):
+    return sum(int(df.memory_usage(deep=True).sum()) for df in datos.values())
+
+
+def ejecutar_pipeline(datos, etapas=ETAPAS, informe=None):
+    """Ejecuta las etapas en orden.
+
+    Si se pasa una lista en `informe`, se le agrega por cada etapa el tiempo
+    que tardó y la memoria ocupada por los frames al terminar.
+    """
+    for etapa in etapas:
+        if informe is None:
+            datos = etapa(datos)
+            continue
+
+        inicio = time.perf_counter()
+        datos = etapa(datos)
+        segundos = time.perf_counter() - inicio
+        informe.append({
+            'etapa': etapa.__name__.removeprefix('etapa_'),
+            'segundos': segundos,
+            'memoria_mb': _memoria(datos) / 2**20,
+            'filas': sum(len(df) for df in datos.values()),
+        })
+    return datos
+
+
+def construir_df_final(hechos, victimas, informe=None):
+    """Aplica el Mini ETL sobre los datasets crudos y devuelve `df_final`."""
+    return ejecutar_pipeline({'hechos': hechos, 'victimas': victimas}, informe=informe)['df_final']
+
+
+def informe_pipeline(hechos, victimas):
+    """Devuelve un DataFrame con el tiempo y la memoria de cada etapa del ETL."""
+    informe = []
+    construir_df_final(hechos, victimas, informe)
+    return pd.DataFrame(informe)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=MAX_VERSIONES, show_spinner=False)
+def _cargar_version(huella, ruta_hechos, ruta_victimas):
+    # `huella` es la clave de la caché: si cambia el contenido de los CSV se
+    # crea una entrada nueva y la más vieja se descarta.
+    # Es un recurso compartido por todas las sesiones (no se copia en cada una),
+    # por eso los frames que devuelve no se deben modificar.
+    directorio = Path(ruta_hechos).parent / 'binarios'
+    datos = almacenamiento.leer_binarios(huella, directorio)
+    if datos is not None:
+        return datos
+
+    # Los binarios no existen o están desactualizados: vuelvo a los CSV
+    with metricas.tramo('etl.lectura_csv'):
+        hechos, victimas = leer_csv(ruta_hechos, ruta_victimas)
+
+    # Con las métricas activas registro también el tiempo de cada etapa del ETL
+    informe = [] if metricas.ACTIVO else None
+    df_final = construir_df_final(hechos, victimas, informe)
+    for etapa in informe or []:
+        metricas.registrar(f"etl.{etapa['etapa']}", etapa['segundos'])
+
+    if almacenamiento.disponible():
+        try:
+            huella_csv = huella_fuentes_version(ruta_hechos, ruta_victimas)
+            almacenamiento.escribir_binarios(hechos, victimas, df_final, huella_csv, directorio)
+        except OSError:
+            pass
+        else:
+            # Releo los binarios recién escritos para usar la versión mapeada en memoria
+            datos = almacenamiento.leer_binarios(huella_csv, directorio)
+            if datos is not None:
+                return datos
+
+    return hechos, victimas, df_final
+
+
+def cargar_datos(ruta_hechos=None, ruta_victimas=None):
+    """Devuelve `(hechos, victimas, df_final)` para la versión actual de los CSV.
+
+    Los frames son compartidos entre sesiones y de sólo lectura.
+    """
+    ruta_hechos, ruta_victimas = rutas(ruta_hechos, ruta_victimas)
+    huella = huella_version(ruta_hechos, ruta_victimas)
+    return _cargar_version(huella, str(ruta_hechos), str(ruta_victimas))
+
+
+def cargar_df_final(ruta_hechos=None, ruta_victimas=None):
+    return cargar_datos(ruta_hechos, ruta_victimas)[2]
+
+
+def invalidar_cache():
+    """Descarta todas las versiones cacheadas y las huellas calculadas."""
+    _cargar_version.clear()
+    _huellas.clear()
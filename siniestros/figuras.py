@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from siniestros import graficos, metricas
+from siniestros.mapa import UMBRAL_PUNTOS
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché LRU de las figuras ya serializadas
+#
+# La clave es el nombre del gráfico, la versión de los datos y la selección de los
+# filtros en forma canónica, así dos visitantes con los mismos filtros comparten la
+# figura aunque hayan tildado las opciones en otro orden.
+#
+# SINIESTROS_FIGURAS_MB  tamaño máximo de la caché, en MB de JSON (por defecto 64)
+
+MAX_MB = float(os.environ.get('SINIESTROS_FIGURAS_MB', 64))
+
+
+def firma(selecciones):
+    """Forma canónica de una selección: dimensiones ordenadas y valores ordenados y sin repetir."""
+    return tuple(
+        (dimension, tuple(sorted(set(valores), key=str)))
+        for dimension, valores in sorted(selecciones.items())
+    )
+
+
+def clave(nombre, huella, selecciones, *extra):
+    """Clave de un gráfico para una versión de los datos y una selección de filtros."""
+    return (nombre, huella, firma(selecciones), *extra)
+
+
+class CacheFiguras:
+    """Figuras en JSON con desalojo LRU por tamaño y contadores de aciertos y fallos.
+
+    Se guarda el JSON (y no el objeto de plotly) para que cada sesión reciba su
+    propia copia y para poder medir lo que ocupa cada figura.
+    """
+
+    def __init__(self, max_bytes=int(MAX_MB * 1024 ** 2)):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.aciertos = self.fallos = self.desalojos = 0
+        self._figuras = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._figuras)
+
+    def obtener(self, clave, construir):
+        """Devuelve la figura de `clave`. Si no está, la arma con `construir()` y la guarda."""
+        with self._lock:
+            texto = self._figuras.get(clave)
+            if texto is not None:
+                self._figuras.move_to_end(clave)
+                self.aciertos += 1
+            else:
+                self.fallos += 1
+
+        # La figura se arma fuera del lock: dos sesiones con la misma clave pueden armarla a la vez
+        if texto is None:
+            texto = construir().to_json()
+            self._guardar(clave, texto)
+        # El JSON ya salió de una figura válida: rearmarla sin los validadores de plotly
+        # es un orden de magnitud más rápido que construirla (y que pasarle un dict a st.plotly_chart,
+        # que la valida entera)
+        return go.Figure(json.loads(texto), _validate=False)
+
+    def _guardar(self, clave, texto):
+        tamaño = len(texto)
+        if tamaño > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._figuras:
+                self.bytes -= len(self._figuras.pop(clave))
+            self._figuras[clave] = texto
+            self.bytes += tamaño
+            while self.bytes > self.max_bytes:
+                _, desalojada = self._figuras.popitem(last=False)
+                self.bytes -= len(desalojada)
+                self.desalojos += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._figuras.clear()
+            self.bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'figuras': len(self._figuras),
+                'mb': self.bytes / 1024 ** 2,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Figuras del dashboard
+GRAFICOS = ['por_año', 'mapa', 'por_comuna', 'sexo', 'semestres']
+
+
+class FigurasDashboard:
+    """Los cinco gráficos del dashboard para una selección de filtros.
+
+    Es el único lugar donde se decide cómo se arma cada gráfico y con qué clave
+    se guarda en la caché: lo usan la página, el precalentamiento y los reportes.
+    El mapa dibuja cada siniestro sólo si hay `df_final` e `indice` y pocos casos.
+    """
+
+    def __init__(self, selecciones, cubo, piramide, token, df_final=None, indice=None, huella=None, cache=None):
+        self.selecciones = selecciones
+        self.huella, self.cache = huella, cache
+        self.celdas = celdas = cubo.filtrar(selecciones)
+        self.casos = int(celdas['CASOS'].sum())
+
+        if df_final is not None and self.casos <= UMBRAL_PUNTOS:
+            modo, mapa = 'puntos', lambda: graficos.figura_mapa(df_final[indice.mascara(selecciones)], token)
+        else:
+            modo, mapa = 'celdas', lambda: graficos.figura_mapa_celdas(piramide.celdas(selecciones), token)
+
+        # Nombre -> (constructor, datos extra de la clave)
+        self.constructores = {
+            'por_año': (lambda: graficos.figura_por_año(cubo.sumar_por(celdas, 'AAAA')), ()),
+            'mapa': (mapa, (modo, token)),
+            'por_comuna': (lambda: graficos.figura_por_comuna(cubo.sumar_por(celdas, 'COMUNA')), ()),
+            'sexo': (lambda: graficos.figura_sexo(cubo.sumar_por(celdas, 'SEXO')), ()),
+            'semestres': (lambda: graficos.figura_semestres(cubo.por_semestre(celdas)), ()),
+        }
+
+    def figura(self, nombre):
+        """Devuelve un gráfico, desde la caché de figuras si se pasó una."""
+        construir, extra = self.constructores[nombre]
+        if self.cache is None:
+            return construir()
+        return self.cache.obtener(clave(nombre, self.huella, self.selecciones, *extra), construir)
+
+    def todas(self):
+        return {nombre: self.figura(nombre) for nombre in GRAFICOS}
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(show_spinner=False)
+def cargar_figuras():
+    """Devuelve la caché de figuras del proceso, compartida por todas las sesiones."""
+    return CacheFiguras()
+
+
+def panel(cache):
+    """Muestra los contadores de la caché en la barra lateral (sólo con las métricas activas)."""
+    if not metricas.ACTIVO:
+        return
+    estadisticas = cache.estadisticas()
+    with st.sidebar.expander('Caché de figuras', expanded=False):
+        st.write(
+            f"{estadisticas['figuras']} figuras ({estadisticas['mb']:.1f} de {cache.max_bytes / 1024 ** 2:.0f} MB) · "
+            f"{estadisticas['aciertos']} aciertos · {estadisticas['fallos']} fallos · "
+            f"{estadisticas['desalojos']} desalojos · tasa de aciertos {estadisticas['tasa_aciertos']:.0%}"
+        )
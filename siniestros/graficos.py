@@ -0,0 +1,99 @@
+import plotly.express as px
+import plotly.graph_objects as go
+
+#---------------------------------------------------------------------------------------------------------------------
+# Gráficos del dashboard. Todos reciben datos ya agregados.
+
+def figura_por_año(conteo_por_año): # Scatter Plot ----------------------------------------------------------------------
+    fig = go.Figure()
+
+    # Creo el gráfico
+    fig.add_trace(go.Scatter(x=conteo_por_año.index, y=conteo_por_año.values, mode='lines+markers'))
+
+    # Etiquetas
+    fig.update_layout(
+        title='Cantidad de casos por año',
+        xaxis_title='Año',
+        yaxis_title='Cantidad de casos'
+    )
+    return fig
+
+
+def figura_mapa(df_puntos, token): # Map Plot ---------------------------------------------------------------------------
+    # Le doy acceso para setear un map plot
+    px.set_mapbox_access_token(token)
+
+    # Creo el gráfico
+    fig = px.scatter_mapbox(
+        df_puntos,
+        lat="pos y",
+        lon="pos x",
+        color="VICTIMA",
+        color_continuous_scale=px.colors.sequential.Rainbow,
+        size_max=15,
+        zoom=10,
+        title='Lugares de los siniestros'
+        )
+    return fig
+
+
+def figura_mapa_celdas(celdas, token): # Map Plot agregado -------------------------------------------------------------
+    # Recibe una fila por celda y víctima, con la cantidad de casos
+    px.set_mapbox_access_token(token)
+
+    fig = px.scatter_mapbox(
+        celdas,
+        lat="pos y",
+        lon="pos x",
+        color="VICTIMA",
+        size="CASOS",
+        hover_data={"CASOS": True, "pos x": False, "pos y": False},
+        size_max=25,
+        zoom=10,
+        title='Lugares de los siniestros (agrupados por zona)'
+        )
+    return fig
+
+
+def figura_por_comuna(conteo_comunas): # Bar Chart ----------------------------------------------------------------------
+    if conteo_comunas is None or len(conteo_comunas) == 0:
+        # Creo un gráfico vacío
+        fig = px.bar(title="Siniestros por comuna")
+    else:
+        fig = px.bar(
+            y=conteo_comunas.values,
+            x=conteo_comunas.index.astype(str),
+            title="Siniestros por comuna")
+
+    fig.update_layout(
+        yaxis_title='CONTEO',
+        xaxis_title='COMUNA',
+        width=600)
+    return fig
+
+
+def figura_sexo(conteo_sexo): # Pie Plot --------------------------------------------------------------------------------
+    if conteo_sexo is None or len(conteo_sexo) == 0:
+        # Creo un gráfico vacío
+        return px.pie(title="Siniestros por comuna")
+
+    fig = px.pie(
+        values=conteo_sexo.values,
+        names=conteo_sexo.index.astype(str),
+        hole=.3,
+        title="Sexo de las víctimas")
+
+    fig.update_layout(
+        width=600,
+        height=400)
+    return fig
+
+
+def figura_semestres(semestres): # Bar Plot -----------------------------------------------------------------------------
+    # Recibe una fila por año con la cantidad de casos de cada semestre
+    fig = px.bar(
+        semestres,
+        x='AAAA',
+        y=['SEM_1','SEM_2'],
+        title='Casos por semestres a lo largo de los años')
+    return fig
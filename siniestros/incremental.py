@@ -0,0 +1,274 @@
+"""Actualización incremental de los binarios con nuevas publicaciones del Observatorio.
+
+Uso (desde la raíz del repositorio):
+    python -m siniestros.incremental                       # compara los CSV actuales con lo guardado
+    python -m siniestros.incremental --hechos nuevos_hechos.csv --victimas nuevas_victimas.csv
+
+Sólo los hechos nuevos o modificados pasan por el Mini ETL; el resultado se
+agrega cómo un segmento a los binarios y los agregados (el cubo de conteos, la
+pirámide del mapa y las celdas de los KPIs) se corrigen en el lugar. Correrlo dos veces con los mismos datos no cambia nada.
+"""
+import argparse
+import hashlib
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from siniestros import almacenamiento, etl
+from siniestros.cubo import DIMENSIONES_CUBO, agregar
+from siniestros.kpi import DIMENSIONES_KPI, MEDIDAS, agregar_kpi
+from siniestros.mapa import CLAVES_NIVEL, MEDIDAS_NIVEL, NIVELES, agregar_nivel, nombre_nivel
+
+#---------------------------------------------------------------------------------------------------------------------
+# Estado: un hash por hecho para detectar qué cambió sin comparar fila por fila
+ESTADO = 'estado_ids'
+
+
+def _hash_filas(df):
+    return pd.util.hash_pandas_object(df, index=False)
+
+
+def calcular_estado(hechos, victimas):
+    """Devuelve un DataFrame con el hash de cada hecho y la suma de los hashes de sus víctimas."""
+    h_hechos = pd.Series(_hash_filas(hechos).to_numpy(), index=hechos['ID'].astype(str).to_numpy(), name='H_HECHO')
+    h_victimas = (
+        pd.Series(_hash_filas(victimas).to_numpy(), index=victimas['ID_hecho'].astype(str).to_numpy())
+        .groupby(level=0).sum()
+        .rename('H_VICTIMAS')
+    )
+    estado = pd.concat([h_hechos, h_victimas], axis=1).fillna(0).astype('uint64')
+    return estado.rename_axis('ID').reset_index()
+
+
+def _cambiados(estado_nuevo, estado_viejo):
+    # IDs nuevos o con algún hash distinto al guardado
+    comparados = estado_nuevo.merge(estado_viejo, on='ID', how='left', suffixes=('', '_VIEJO'))
+    distintos = (
+        (comparados['H_HECHO'] != comparados['H_HECHO_VIEJO'])
+        | (comparados['H_VICTIMAS'] != comparados['H_VICTIMAS_VIEJO'])
+    )
+    return set(comparados.loc[distintos, 'ID'])
+
+
+def leer_delta(ruta, nombre, directorio=None):
+    """Lee un CSV delta con los mismos tipos que el archivo guardado `nombre`."""
+    # Un delta chico puede inferir otros tipos (por ejemplo EDAD numérica si no trae 'SD')
+    referencia = almacenamiento.leer(nombre, directorio, ids=[])
+    textos = {
+        columna: str for columna in referencia.columns
+        if pd.api.types.is_string_dtype(referencia[columna]) and not isinstance(referencia[columna].dtype, pd.CategoricalDtype)
+    }
+    # Los SD pasan a nulos cómo en `etl.leer_csv`, así los hashes se comparan con lo guardado
+    return etl.sin_dato_a_nulo(almacenamiento.tipar(pd.read_csv(ruta, dtype=textos), nombre))
+
+
+def _huella_deltas(*rutas_delta):
+    sha = hashlib.sha256()
+    for ruta in rutas_delta:
+        if ruta is not None:
+            sha.update(etl.huella_archivo(ruta).encode())
+    return sha.hexdigest()[:16]
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Agregados persistidos: el cubo de conteos, los niveles de la pirámide del mapa y las celdas de los KPIs
+def _corregir(celdas, restas, sumas, claves, medidas, conteo='CASOS'):
+    # Resta las celdas de las filas que salen, suma las de las que entran y descarta las que quedan sin filas
+    # (`conteo` es la medida que cuenta las filas de cada celda)
+    restas = restas.copy()
+    restas[medidas] = -restas[medidas]
+    celdas = almacenamiento.concatenar([celdas, restas, sumas])
+    celdas = celdas.groupby(claves, observed=True, dropna=False)[medidas].sum().reset_index()
+    return celdas[celdas[conteo] > 0].reset_index(drop=True)
+
+
+def actualizar_cubo(celdas, df_viejo, df_nuevo):
+    """Resta las celdas de las filas dadas de baja y suma las de las filas nuevas."""
+    return _corregir(celdas, agregar(df_viejo), agregar(df_nuevo), DIMENSIONES_CUBO, ['CASOS'])
+
+
+def actualizar_nivel(celdas, tamaño, df_viejo, df_nuevo):
+    """Lo mismo que `actualizar_cubo` para un nivel de la pirámide del mapa."""
+    return _corregir(celdas, agregar_nivel(df_viejo, tamaño), agregar_nivel(df_nuevo, tamaño), CLAVES_NIVEL, MEDIDAS_NIVEL)
+
+
+def actualizar_kpi(celdas, df_viejo, df_nuevo):
+    """Lo mismo que `actualizar_cubo` para las celdas de los KPIs (HOMICIDIOS cuenta las víctimas)."""
+    return _corregir(celdas, agregar_kpi(df_viejo), agregar_kpi(df_nuevo), DIMENSIONES_KPI, MEDIDAS, 'HOMICIDIOS')
+
+
+# Nombre de cada agregado y cómo se calcula desde cero o se corrige con las filas que cambian
+AGREGADOS = {
+    'cubo': (agregar, actualizar_cubo),
+    **{
+        nombre_nivel(numero): (
+            lambda df, tamaño=tamaño: agregar_nivel(df, tamaño),
+            lambda celdas, df_viejo, df_nuevo, tamaño=tamaño: actualizar_nivel(celdas, tamaño, df_viejo, df_nuevo),
+        )
+        for numero, tamaño in enumerate(NIVELES)
+    },
+    'kpi': (agregar_kpi, actualizar_kpi),
+}
+
+
+def _guardar_agregados(df_final, estado, manifiesto, directorio):
+    almacenamiento.escribir(estado, ESTADO, manifiesto['huella'], directorio)
+    for nombre, (calcular, _) in AGREGADOS.items():
+        almacenamiento.escribir(calcular(df_final), nombre, manifiesto['huella'], directorio)
+    manifiesto['agregados'] = list(AGREGADOS)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Actualización
+def reconstruir(ruta_hechos=None, ruta_victimas=None):
+    """Construye los binarios, el estado y el cubo desde cero a partir de los CSV."""
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    directorio = Path(ruta_hechos).parent / 'binarios'
+    huella = etl.huella_fuentes_version(ruta_hechos, ruta_victimas)
+
+    hechos, victimas = etl.leer_csv(ruta_hechos, ruta_victimas)
+    df_final = etl.construir_df_final(hechos, victimas)
+    almacenamiento.escribir_binarios(hechos, victimas, df_final, huella, directorio)
+
+    manifiesto = dict(almacenamiento.leer_manifiesto(directorio))
+    _guardar_agregados(df_final, calcular_estado(hechos, victimas), manifiesto, directorio)
+    almacenamiento.escribir_manifiesto(manifiesto, directorio)
+    return {'modo': 'completo', 'cambiados': len(hechos), 'bajas': 0, 'huella': huella}
+
+
+def actualizar(ruta_hechos=None, ruta_victimas=None, delta_hechos=None, delta_victimas=None):
+    """Aplica a los binarios sólo los hechos nuevos o modificados.
+
+    Sin deltas se comparan los CSV actuales con lo guardado (los IDs que ya no
+    están se dan de baja). Con deltas, cada ID que aparece en un archivo delta
+    reemplaza su hecho o todas sus víctimas; la parte que no viene en el delta
+    se toma de lo guardado.
+
+    Devuelve un diccionario con el modo, la cantidad de IDs cambiados y dados de
+    baja y la huella resultante.
+    """
+    if not almacenamiento.disponible():
+        raise RuntimeError('Se necesita pyarrow para la actualización incremental')
+
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    directorio = Path(ruta_hechos).parent / 'binarios'
+    con_deltas = delta_hechos is not None or delta_victimas is not None
+
+    # Sin binarios de esta versión del ETL no hay sobre qué aplicar cambios
+    manifiesto = almacenamiento.leer_manifiesto(directorio)
+    if not manifiesto or not manifiesto['base'].endswith(f'-v{etl.VERSION_ETL}'):
+        resultado = reconstruir(ruta_hechos, ruta_victimas)
+        if not con_deltas:
+            return resultado
+        manifiesto = almacenamiento.leer_manifiesto(directorio)
+    manifiesto = {**manifiesto, 'segmentos': dict(manifiesto['segmentos']), 'deltas': list(manifiesto['deltas'])}
+
+    try:
+        estado_viejo = almacenamiento.leer(ESTADO, directorio)
+    except (OSError, almacenamiento.pa.ArrowInvalid):
+        hechos, victimas = almacenamiento.leer('hechos', directorio), almacenamiento.leer('victimas', directorio)
+        estado_viejo = calcular_estado(hechos, victimas)
+
+    if con_deltas:
+        huella_delta = _huella_deltas(delta_hechos, delta_victimas)
+        if huella_delta in manifiesto['deltas']:
+            return {'modo': 'delta', 'cambiados': 0, 'bajas': 0, 'huella': manifiesto['huella']}
+
+        # El delta trae hechos, víctimas o ambos: lo que falta sale de los binarios
+        hechos_delta = leer_delta(delta_hechos, 'hechos', directorio) if delta_hechos else None
+        victimas_delta = leer_delta(delta_victimas, 'victimas', directorio) if delta_victimas else None
+        ids = set()
+        if hechos_delta is not None:
+            ids.update(hechos_delta['ID'].astype(str))
+        if victimas_delta is not None:
+            ids.update(victimas_delta['ID_hecho'].astype(str))
+
+        partes_hechos = [almacenamiento.leer('hechos', directorio, ids)]
+        if hechos_delta is not None:
+            partes_hechos = [partes_hechos[0][~partes_hechos[0]['ID'].astype(str).isin(hechos_delta['ID'].astype(str))], hechos_delta]
+        partes_victimas = [almacenamiento.leer('victimas', directorio, ids)]
+        if victimas_delta is not None:
+            reemplazados = victimas_delta['ID_hecho'].astype(str)
+            partes_victimas = [partes_victimas[0][~partes_victimas[0]['ID_hecho'].astype(str).isin(reemplazados)], victimas_delta]
+        hechos = almacenamiento.concatenar(partes_hechos)
+        victimas = almacenamiento.concatenar(partes_victimas)
+        removidos = set()
+    else:
+        huella_csv = etl.huella_fuentes_version(ruta_hechos, ruta_victimas)
+        if manifiesto['base'] == huella_csv:
+            return {'modo': 'completo', 'cambiados': 0, 'bajas': 0, 'huella': manifiesto['huella']}
+        hechos, victimas = etl.leer_csv(ruta_hechos, ruta_victimas)
+        removidos = set(estado_viejo['ID']) - set(hechos['ID'].astype(str))
+
+    estado_nuevo = calcular_estado(hechos, victimas)
+    cambiados = _cambiados(estado_nuevo, estado_viejo)
+
+    # Nueva huella: la de los CSV, o la anterior combinada con la de los deltas
+    if con_deltas:
+        manifiesto['deltas'].append(huella_delta)
+        huella = hashlib.sha256((manifiesto['huella'] + huella_delta).encode()).hexdigest()[:16]
+        manifiesto['huella'] = f'{huella}-v{etl.VERSION_ETL}'
+    else:
+        manifiesto['base'] = manifiesto['huella'] = huella_csv
+        manifiesto['deltas'] = []
+
+    bajas = cambiados | removidos
+    if bajas:
+        # Mini ETL sólo sobre los hechos que cambiaron
+        hechos = hechos[hechos['ID'].astype(str).isin(cambiados)]
+        victimas = victimas[victimas['ID_hecho'].astype(str).isin(cambiados)]
+        df_nuevo = etl.construir_df_final(hechos, victimas)
+        df_viejo = almacenamiento.leer('df_final', directorio, bajas)
+
+        for nombre, df in [('hechos', hechos), ('victimas', victimas), ('df_final', df_nuevo)]:
+            almacenamiento.agregar_segmento(df, bajas, nombre, manifiesto, directorio)
+
+        estado = almacenamiento.concatenar([
+            estado_viejo[~estado_viejo['ID'].isin(bajas)],
+            estado_nuevo[estado_nuevo['ID'].isin(cambiados)],
+        ])
+        almacenamiento.escribir(estado, ESTADO, manifiesto['huella'], directorio)
+
+        # Los agregados se corrigen con las filas que salen y las que entran
+        for nombre in manifiesto.get('agregados', []):
+            celdas = AGREGADOS[nombre][1](almacenamiento.leer(nombre, directorio), df_viejo, df_nuevo)
+            almacenamiento.escribir(celdas, nombre, manifiesto['huella'], directorio)
+    else:
+        # Sin cambios de filas sólo se renueva la huella de los agregados
+        for nombre in manifiesto.get('agregados', []):
+            almacenamiento.escribir(almacenamiento.leer(nombre, directorio), nombre, manifiesto['huella'], directorio)
+
+    almacenamiento.escribir_manifiesto(manifiesto, directorio)
+
+    # Con demasiados segmentos la lectura se vuelve lenta: reescribo los archivos base
+    if max(manifiesto['segmentos'].values(), default=0) > almacenamiento.MAX_SEGMENTOS:
+        compactar(directorio)
+
+    return {'modo': 'delta' if con_deltas else 'completo', 'cambiados': len(cambiados), 'bajas': len(removidos), 'huella': manifiesto['huella']}
+
+
+def compactar(directorio=None):
+    """Reescribe los archivos base con sus segmentos aplicados."""
+    manifiesto = almacenamiento.leer_manifiesto(directorio)
+    manifiesto = {**manifiesto, 'segmentos': dict(manifiesto['segmentos'])}
+    for nombre in list(manifiesto['segmentos']):
+        almacenamiento.compactar(almacenamiento.leer(nombre, directorio), nombre, manifiesto, directorio)
+    almacenamiento.escribir_manifiesto(manifiesto, directorio)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Actualiza los binarios con los hechos nuevos o modificados')
+    parser.add_argument('--hechos', type=Path, help='CSV delta con hechos nuevos o corregidos')
+    parser.add_argument('--victimas', type=Path, help='CSV delta con víctimas nuevas o corregidas')
+    parser.add_argument('--compactar', action='store_true', help='aplicar los segmentos a los archivos base')
+    args = parser.parse_args()
+
+    if not almacenamiento.disponible():
+        sys.exit('Se necesita pyarrow para la actualización incremental')
+    if args.compactar:
+        compactar(etl.dir_datos() / 'binarios')
+        sys.exit()
+
+    resultado = actualizar(delta_hechos=args.hechos, delta_victimas=args.victimas)
+    print(f"{resultado['cambiados']} hechos actualizados, {resultado['bajas']} dados de baja (huella {resultado['huella']})")
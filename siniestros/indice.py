@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from siniestros import etl
+
+#---------------------------------------------------------------------------------------------------------------------
+# Índice de bitmaps para los filtros del dashboard
+DIMENSIONES = ['AAAA', 'COMUNA', 'GRUPO ETARIO', 'TIPO_DE_CALLE']
+
+
+class IndiceFiltros:
+    """Guarda un bitmap empaquetado por cada valor distinto de cada dimensión.
+
+    Una selección se resuelve haciendo OR de los bitmaps de los valores elegidos
+    dentro de cada dimensión y AND entre dimensiones, sin volver a recorrer las
+    columnas del DataFrame.
+    """
+
+    def __init__(self, df, dimensiones=DIMENSIONES):
+        self.filas = len(df)
+        self.valores = {}   # Valores distintos de cada dimensión, en orden
+        self.bitmaps = {}   # dimensión -> {valor: bitmap}
+        self.no_nulos = {}  # dimensión -> bitmap de las filas con algún valor
+
+        for dimension in dimensiones:
+            columna = df[dimension]
+            if isinstance(columna.dtype, pd.CategoricalDtype):
+                codigos = columna.cat.codes.to_numpy()
+                valores = columna.cat.categories
+            else:
+                codigos, valores = pd.factorize(columna, sort=True)
+
+            self.valores[dimension] = valores.tolist()
+            self.bitmaps[dimension] = {
+                valor: np.packbits(codigos == codigo)
+                for codigo, valor in enumerate(self.valores[dimension])
+            }
+            self.no_nulos[dimension] = np.packbits(codigos >= 0)
+
+    def bitmap_dimension(self, dimension, seleccion):
+        """OR de los bitmaps de los valores seleccionados en una dimensión."""
+        seleccion = set(seleccion)
+        if seleccion.issuperset(self.valores[dimension]):
+            return self.no_nulos[dimension]
+
+        bitmaps = [self.bitmaps[dimension][valor] for valor in seleccion if valor in self.bitmaps[dimension]]
+        if not bitmaps:
+            return np.zeros_like(self.no_nulos[dimension])
+        return np.bitwise_or.reduce(bitmaps)
+
+    def bitmap(self, selecciones):
+        """AND entre dimensiones de los bitmaps de cada selección."""
+        resultado = None
+        for dimension, seleccion in selecciones.items():
+            bitmap = self.bitmap_dimension(dimension, seleccion)
+            resultado = bitmap.copy() if resultado is None else np.bitwise_and(resultado, bitmap, out=resultado)
+        if resultado is None:
+            return np.packbits(np.ones(self.filas, dtype=bool))
+        return resultado
+
+    def mascara(self, selecciones):
+        """Devuelve la máscara booleana de las filas que cumplen la selección."""
+        return np.unpackbits(self.bitmap(selecciones), count=self.filas).astype(bool)
+
+    def contar(self, selecciones):
+        return int(np.unpackbits(self.bitmap(selecciones), count=self.filas).sum())
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _indice_version(huella, _df_final):
+    # El DataFrame no se hashea: la huella ya identifica la versión de los datos
+    return IndiceFiltros(_df_final)
+
+
+def cargar_indice(df_final, huella=None):
+    """Devuelve el índice de filtros de la versión actual de `df_final`."""
+    return _indice_version(huella or etl.huella_version(), df_final)
@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from siniestros import almacenamiento, etl
+from siniestros.indice import IndiceFiltros
+
+#---------------------------------------------------------------------------------------------------------------------
+# Motor de KPIs
+#
+# KPI 1: reducir un 10% los homicidios del último semestre respecto del anterior.
+# KPI 2: reducir un 7% los siniestros mortales de motociclistas del último año respecto del anterior.
+
+DIMENSIONES_KPI = ['AAAA', 'SEMESTRE', 'COMUNA', 'GRUPO ETARIO', 'TIPO_DE_CALLE']
+
+# HOMICIDIOS cuenta las víctimas fatales. MOTO_VICTIMA las que iban en moto
+# (la medida del análisis original) y MOTO_IMPLICADA las de hechos con una moto
+# cómo víctima o cómo acusado.
+MEDIDAS = ['HOMICIDIOS', 'MOTO_VICTIMA', 'MOTO_IMPLICADA']
+
+REDUCCION_HOMICIDIOS = 0.10
+REDUCCION_MOTOS = 0.07
+
+# Año de la pandemia de COVID-19: el año siguiente conviene compararlo con el anterior a ella
+AÑO_PANDEMIA = 2020
+
+
+def formatear(valor, decimales=1):
+    """Número con hasta `decimales` decimales y sin ceros de más (49.5, 26, 46.5)."""
+    return f'{valor:.{decimales}f}'.rstrip('0').rstrip('.')
+
+
+def nombre_semestre(año, semestre):
+    return f"{'primer' if semestre == 1 else 'segundo'} semestre de {año}"
+
+
+def agregar_kpi(df):
+    """Suma las medidas de los KPIs por año, semestre, comuna y dimensiones de los filtros en una sola pasada."""
+    moto_victima = (df['VICTIMA'] == 'MOTO').to_numpy()
+    medidas = pd.DataFrame({
+        'AAAA': df['AAAA'],
+        'SEMESTRE': np.where(df['MM'] <= 6, 1, 2),
+        'COMUNA': df['COMUNA'],
+        'GRUPO ETARIO': df['GRUPO ETARIO'],
+        'TIPO_DE_CALLE': df['TIPO_DE_CALLE'],
+        'HOMICIDIOS': 1,
+        'MOTO_VICTIMA': moto_victima.astype(int),
+        'MOTO_IMPLICADA': (moto_victima | (df['ACUSADO'] == 'MOTO').to_numpy()).astype(int),
+    })
+    return medidas.groupby(DIMENSIONES_KPI, observed=True, dropna=False)[MEDIDAS].sum().reset_index()
+
+
+def evaluar(serie, reduccion, ventana=1, desfase=None):
+    """Compara cada período con uno anterior.
+
+    `ventana` suma los últimos n períodos (ventana móvil) y `desfase` indica
+    contra cuántos períodos atrás se compara (por defecto, la ventana anterior).
+    El objetivo se cumple si ACTUAL < ANTERIOR * (1 - reduccion), es decir, si KPI < 1.
+    """
+    actual = serie.rolling(ventana, min_periods=ventana).sum()
+    anterior = actual.shift(desfase or ventana)
+    objetivo = anterior * (1 - reduccion)
+    return pd.DataFrame({
+        'ACTUAL': actual,
+        'ANTERIOR': anterior,
+        'OBJETIVO': objetivo,
+        'RATIO': actual / anterior.replace(0, np.nan),
+        'KPI': actual / objetivo.replace(0, np.nan),
+        'CUMPLE': actual < objetivo,
+    })
+
+
+class MotorKPI:
+    """Medidas de los KPIs por celda (ver `CuboConteos`), con un índice de filtros sobre las celdas.
+
+    Las celdas llevan además el semestre y las medidas de los dos KPIs, así una
+    misma tabla sirve para evaluar cualquier ventana o desfase de ambos.
+    """
+
+    def __init__(self, celdas):
+        self.celdas = celdas.reset_index(drop=True)
+        self.indice = IndiceFiltros(self.celdas)
+
+    @classmethod
+    def desde_df(cls, df):
+        return cls(agregar_kpi(df))
+
+    def filtrar(self, selecciones):
+        return self.celdas[self.indice.mascara(selecciones)]
+
+    def _tabla(self, selecciones, periodo, medida, por_comuna):
+        # Una columna por comuna (o una sola con el total) y una fila por período de todo el
+        # rango de años, incluidos los períodos sin casos. El filtro de años no se aplica acá:
+        # cada período se compara con el que le sigue en el calendario aunque no esté seleccionado.
+        celdas = self.filtrar({dimension: valores for dimension, valores in selecciones.items() if dimension != 'AAAA'})
+        todos = self.indice.valores['AAAA']
+        años = range(int(min(todos)), int(max(todos)) + 1) if todos else []
+        periodos = pd.MultiIndex.from_product([años, [1, 2]], names=periodo) if len(periodo) == 2 else pd.Index(años, name='AAAA')
+
+        grupos = periodo + ['COMUNA'] if por_comuna else periodo
+        tabla = celdas.groupby(grupos, observed=True)[medida].sum()
+        tabla = tabla.unstack('COMUNA') if por_comuna else tabla.to_frame('TOTAL')
+        return tabla.reindex(periodos, fill_value=0).fillna(0)
+
+    def _evaluar(self, tabla, reduccion, ventana, desfase, por_comuna, selecciones):
+        resultados = {columna: evaluar(tabla[columna], reduccion, ventana, desfase) for columna in tabla.columns}
+        if not por_comuna:
+            resultado = resultados['TOTAL'].reset_index()
+        else:
+            if not resultados:
+                # Selección sin casos: ninguna comuna, pero con las mismas columnas
+                resultados = {None: evaluar(pd.Series(0.0, index=tabla.index), reduccion, ventana, desfase).iloc[:0]}
+            resultado = pd.concat(resultados, names=['COMUNA']).reset_index()
+
+        # Recién ahora se quedan sólo los años seleccionados
+        if 'AAAA' in selecciones:
+            resultado = resultado[resultado['AAAA'].isin(selecciones['AAAA'])].reset_index(drop=True)
+        return resultado
+
+    # KPIs ------------------------------------------------------------------------------------------------------------
+    def homicidios_semestrales(self, selecciones, ventana=1, desfase=None, por_comuna=False):
+        """KPI 1 para cada semestre de la selección."""
+        tabla = self._tabla(selecciones, ['AAAA', 'SEMESTRE'], 'HOMICIDIOS', por_comuna)
+        return self._evaluar(tabla, REDUCCION_HOMICIDIOS, ventana, desfase, por_comuna, selecciones)
+
+    def motos_anuales(self, selecciones, ventana=1, desfase=None, por_comuna=False, medida='MOTO_VICTIMA'):
+        """KPI 2 para cada año de la selección."""
+        tabla = self._tabla(selecciones, ['AAAA'], medida, por_comuna)
+        return self._evaluar(tabla, REDUCCION_MOTOS, ventana, desfase, por_comuna, selecciones)
+
+    def motos_entre(self, año, referencia, selecciones=None, medida='MOTO_VICTIMA'):
+        """KPI 2 de `año` comparado con el año `referencia`. None si alguno de los dos no está en los datos."""
+        tabla = self._tabla(selecciones or {}, ['AAAA'], medida, False)['TOTAL']
+        if año not in tabla.index or referencia not in tabla.index:
+            return None
+        return evaluar(tabla.loc[[referencia, año]], REDUCCION_MOTOS).iloc[-1]
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _kpi_version(huella, _df_final):
+    # Si la actualización incremental dejó las celdas guardadas para esta versión, las uso
+    celdas = almacenamiento.leer_agregado('kpi', huella, etl.dir_datos() / 'binarios')
+    if celdas is not None:
+        return MotorKPI(celdas)
+    return MotorKPI.desde_df(_df_final)
+
+
+def cargar_kpi(df_final, huella=None):
+    """Devuelve el motor de KPIs de la versión actual de `df_final`."""
+    return _kpi_version(huella or etl.huella_version(), df_final)
@@ -0,0 +1,99 @@
+import numpy as np
+import streamlit as st
+
+from siniestros import almacenamiento, etl
+from siniestros.indice import DIMENSIONES, IndiceFiltros
+
+#---------------------------------------------------------------------------------------------------------------------
+# Pirámide de grillas para el mapa de siniestros
+
+# Tamaño de celda (en grados) de cada nivel, de la grilla más gruesa a la más fina
+NIVELES = [0.04, 0.02, 0.01, 0.005, 0.0025]
+
+# Hasta esta cantidad de casos se dibuja un punto por siniestro
+UMBRAL_PUNTOS = 2000
+
+# Cantidad máxima de celdas que se envían al navegador
+MAX_CELDAS = 1500
+
+# Esquina de referencia de las grillas (lon, lat), al suroeste de la ciudad
+ORIGEN = (-58.55, -34.71)
+
+# Columnas de cada nivel: la celda y los filtros, y lo que se suma
+CLAVES_NIVEL = ['CELDA_X', 'CELDA_Y', 'VICTIMA', *DIMENSIONES]
+MEDIDAS_NIVEL = ['SUMA_X', 'SUMA_Y', 'CASOS']
+
+
+def nombre_nivel(numero):
+    # Nombre con el que la actualización incremental guarda cada nivel en los binarios
+    return f'piramide_{numero}'
+
+
+def agregar_nivel(df, tamaño, dimensiones=DIMENSIONES, origen=ORIGEN):
+    """Cuenta los siniestros de `df` por celda de una grilla de `tamaño` grados."""
+    df = df.dropna(subset=['pos x', 'pos y'])
+    claves = df[['VICTIMA', *dimensiones]].assign(
+        CELDA_X=np.floor((df['pos x'].to_numpy() - origen[0]) / tamaño).astype(np.int32),
+        CELDA_Y=np.floor((df['pos y'].to_numpy() - origen[1]) / tamaño).astype(np.int32),
+        SUMA_X=df['pos x'],
+        SUMA_Y=df['pos y'],
+        CASOS=1,
+    )
+    columnas = ['CELDA_X', 'CELDA_Y', 'VICTIMA', *dimensiones]
+    return claves.groupby(columnas, observed=True, dropna=False).sum().reset_index()
+
+
+class PiramideEspacial:
+    """Conteos de siniestros por celda de grilla, precalculados para varios niveles.
+
+    Cada nivel guarda una fila por (celda, VICTIMA y dimensiones de filtro) con la
+    cantidad de casos y la suma de las coordenadas, para ubicar cada celda en el
+    centro de sus siniestros. Los filtros se resuelven con un índice de bitmaps
+    sobre las celdas de cada nivel.
+    """
+
+    def __init__(self, celdas_por_nivel, dimensiones=DIMENSIONES):
+        # `celdas_por_nivel` es un diccionario {tamaño: celdas agregadas}
+        self.niveles = [
+            (tamaño, celdas, IndiceFiltros(celdas, dimensiones))
+            for tamaño, celdas in sorted(celdas_por_nivel.items(), reverse=True)
+        ]
+
+    @classmethod
+    def desde_df(cls, df, niveles=NIVELES, dimensiones=DIMENSIONES):
+        return cls({tamaño: agregar_nivel(df, tamaño, dimensiones) for tamaño in niveles}, dimensiones)
+
+    def celdas(self, selecciones, max_celdas=MAX_CELDAS):
+        """Devuelve las celdas filtradas del nivel más fino que no supere `max_celdas`."""
+        resultado = None
+        for tamaño, celdas, indice in reversed(self.niveles):
+            filtradas = celdas[indice.mascara(selecciones)]
+            resultado = (
+                filtradas.groupby(['CELDA_X', 'CELDA_Y', 'VICTIMA'], observed=True)[['SUMA_X', 'SUMA_Y', 'CASOS']]
+                .sum()
+                .reset_index()
+            )
+            if len(resultado) <= max_celdas:
+                break
+
+        # Ubico cada celda en el promedio de las coordenadas de sus siniestros
+        resultado['pos x'] = resultado['SUMA_X'] / resultado['CASOS']
+        resultado['pos y'] = resultado['SUMA_Y'] / resultado['CASOS']
+        return resultado.drop(columns=['SUMA_X', 'SUMA_Y'])
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _piramide_version(huella, _df_final):
+    # Si la actualización incremental dejó los niveles guardados para esta versión, los uso
+    directorio = etl.dir_datos() / 'binarios'
+    niveles = {tamaño: almacenamiento.leer_agregado(nombre_nivel(numero), huella, directorio) for numero, tamaño in enumerate(NIVELES)}
+    if all(celdas is not None for celdas in niveles.values()):
+        return PiramideEspacial(niveles)
+    return PiramideEspacial.desde_df(_df_final)
+
+
+def cargar_piramide(df_final, huella=None):
+    """Devuelve la pirámide espacial de la versión actual de `df_final`."""
+    return _piramide_version(huella or etl.huella_version(), df_final)
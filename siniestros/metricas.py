@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import nullcontext
+from pathlib import Path
+
+import streamlit as st
+
+#---------------------------------------------------------------------------------------------------------------------
+# Instrumentación de las páginas
+#
+# SINIESTROS_METRICAS=1        activa los tramos de tiempo y el panel de métricas
+# SINIESTROS_METRICAS=memoria  además mide la memoria asignada en cada tramo (más lento)
+# SINIESTROS_METRICAS_DIR      carpeta donde se exportan las métricas (por defecto ./metricas)
+
+MODO = os.environ.get('SINIESTROS_METRICAS', '').lower()
+ACTIVO = MODO not in ('', '0', 'false', 'no')
+MEMORIA = MODO == 'memoria'
+DIR_METRICAS = Path(os.environ.get('SINIESTROS_METRICAS_DIR', 'metricas'))
+
+# Cantidad de mediciones que se guardan por tramo para calcular los percentiles
+MAX_MEDICIONES = 1000
+PERCENTILES = [0.5, 0.9, 0.99]
+
+_NULO = nullcontext()
+_mediciones = defaultdict(lambda: deque(maxlen=MAX_MEDICIONES))
+_totales = defaultdict(lambda: [0, 0.0])  # tramo -> [cantidad, segundos acumulados]
+_lock = threading.Lock()
+_primeras = set()  # tramos que se registran una sola vez por proceso
+
+
+def registrar(nombre, segundos, memoria_mb=None):
+    """Guarda una medición de `nombre` y la agrega al log JSONL."""
+    with _lock:
+        _mediciones[nombre].append(segundos)
+        _totales[nombre][0] += 1
+        _totales[nombre][1] += segundos
+
+    registro = {'tramo': nombre, 'segundos': round(segundos, 6), 'ts': round(time.time(), 3)}
+    if memoria_mb is not None:
+        registro['memoria_mb'] = round(memoria_mb, 3)
+    _escribir_log(registro)
+
+
+class _Tramo:
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+    def __enter__(self):
+        if MEMORIA:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self.memoria = tracemalloc.get_traced_memory()[0]
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *excepcion):
+        segundos = time.perf_counter() - self.inicio
+        memoria_mb = (tracemalloc.get_traced_memory()[0] - self.memoria) / 2**20 if MEMORIA else None
+        registrar(self.nombre, segundos, memoria_mb)
+        return False
+
+
+def tramo(nombre):
+    """Context manager que mide el tiempo de un bloque. Si las métricas están apagadas no hace nada."""
+    if not ACTIVO:
+        return _NULO
+    return _Tramo(nombre)
+
+
+def ahora():
+    return time.perf_counter()
+
+
+def registrar_desde(nombre, inicio):
+    """Registra el tiempo transcurrido desde `inicio` (para tramos que abarcan toda una página)."""
+    if ACTIVO:
+        registrar(nombre, time.perf_counter() - inicio)
+
+
+def registrar_primera(nombre, inicio):
+    """Registra el tiempo desde `inicio` sólo la primera vez en el proceso (por ejemplo, el primer pintado)."""
+    if not ACTIVO:
+        return
+    with _lock:
+        if nombre in _primeras:
+            return
+        _primeras.add(nombre)
+    registrar(nombre, time.perf_counter() - inicio)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Resumen y exportación
+def resumen():
+    """Devuelve una fila por tramo con la cantidad de mediciones, percentiles y totales."""
+    import numpy as np
+    import pandas as pd
+
+    with _lock:
+        datos = {nombre: np.array(valores) for nombre, valores in _mediciones.items()}
+        totales = {nombre: tuple(total) for nombre, total in _totales.items()}
+
+    filas = []
+    for nombre, valores in sorted(datos.items()):
+        fila = {'tramo': nombre, 'cantidad': totales[nombre][0], 'total_s': totales[nombre][1]}
+        for percentil in PERCENTILES:
+            fila[f'p{int(percentil * 100)}_ms'] = float(np.quantile(valores, percentil)) * 1000
+        fila['max_ms'] = float(valores.max()) * 1000
+        filas.append(fila)
+    return pd.DataFrame(filas)
+
+
+def _escribir_log(registro):
+    DIR_METRICAS.mkdir(parents=True, exist_ok=True)
+    with _lock, open(DIR_METRICAS / 'tramos.jsonl', 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+
+
+def exportar_prometheus(ruta=None):
+    """Escribe los percentiles en formato de texto de Prometheus (para el textfile collector)."""
+    if not ACTIVO:
+        return None
+    ruta = Path(ruta or DIR_METRICAS / 'siniestros.prom')
+    lineas = [
+        '# HELP siniestros_tramo_segundos Duración de las secciones de las páginas',
+        '# TYPE siniestros_tramo_segundos summary',
+    ]
+    for fila in resumen().itertuples(index=False):
+        fila = fila._asdict()
+        for percentil in PERCENTILES:
+            valor = fila[f'p{int(percentil * 100)}_ms'] / 1000
+            lineas.append(f'siniestros_tramo_segundos{{tramo="{fila["tramo"]}",quantile="{percentil}"}} {valor:.6f}')
+        lineas.append(f'siniestros_tramo_segundos_sum{{tramo="{fila["tramo"]}"}} {fila["total_s"]:.6f}')
+        lineas.append(f'siniestros_tramo_segundos_count{{tramo="{fila["tramo"]}"}} {fila["cantidad"]}')
+
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    temporal = ruta.with_suffix('.prom.tmp')
+    temporal.write_text('\n'.join(lineas) + '\n', encoding='utf-8')
+    temporal.replace(ruta)
+    return ruta
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Panel de depuración
+def panel():
+    """Muestra los percentiles de cada tramo en la barra lateral y exporta el archivo de Prometheus."""
+    if not ACTIVO:
+        return
+    exportar_prometheus()
+    with st.sidebar.expander('Métricas', expanded=False):
+        st.dataframe(resumen(), hide_index=True, column_config={
+            'total_s': st.column_config.NumberColumn('total (s)', format='%.3f'),
+            'p50_ms': st.column_config.NumberColumn('p50 (ms)', format='%.1f'),
+            'p90_ms': st.column_config.NumberColumn('p90 (ms)', format='%.1f'),
+            'p99_ms': st.column_config.NumberColumn('p99 (ms)', format='%.1f'),
+            'max_ms': st.column_config.NumberColumn('max (ms)', format='%.1f'),
+        })
+        st.caption(f'Exportado en {DIR_METRICAS.resolve()}')
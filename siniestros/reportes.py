@@ -0,0 +1,307 @@
+"""Reportes estáticos del dashboard de Siniestros Viales para cada comuna y año.
+
+Uso (desde la raíz del repositorio):
+    python -m siniestros.reportes                                   # todas las comunas y años, en HTML y JSON
+    python -m siniestros.reportes --años 2020 2021 --comunas 1 14   # sólo esas combinaciones
+    python -m siniestros.reportes --formatos html json png --procesos 8
+
+Además de cada comuna × año se generan las vistas con todos los años, todas las
+comunas y la vista por defecto (todo seleccionado). Los gráficos se arman con
+`figuras.FigurasDashboard`, la misma clase que usa la página.
+
+Los procesos leen los binarios mapeados en memoria, así comparten el dataset en
+vez de tener una copia cada uno. El manifiesto de la carpeta de salida guarda la
+firma de cada reporte: los que ya están al día no se vuelven a generar.
+PNG necesita el paquete opcional `kaleido`.
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+from pathlib import Path
+
+from siniestros import etl, figuras
+from siniestros.arranque import TOKEN_MAPA
+from siniestros.cubo import cargar_cubo
+from siniestros.indice import DIMENSIONES, cargar_indice
+from siniestros.kpi import cargar_kpi, formatear
+from siniestros.mapa import cargar_piramide
+
+# Versión de los reportes: si cambia su contenido se incrementa para regenerarlos todos
+VERSION_REPORTES = 1
+
+DIR_SALIDA = Path('reportes')
+MANIFIESTO = 'manifiesto.json'
+FORMATOS = ['html', 'json', 'png']
+
+# Datos de cada proceso (en Linux los procesos los heredan del principal)
+_contexto = None
+
+
+def png_disponible():
+    return importlib.util.find_spec('kaleido') is not None
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Datos
+def cargar_contexto():
+    """Carga el dataset y las estructuras que usan los gráficos, igual que la página."""
+    _, _, df_final = etl.cargar_datos()
+    huella = etl.huella_version()
+    return {
+        'huella': huella,
+        'df_final': df_final,
+        'indice': cargar_indice(df_final, huella),
+        'cubo': cargar_cubo(df_final, huella),
+        'piramide': cargar_piramide(df_final, huella),
+        'kpi': cargar_kpi(df_final, huella),
+        'token': TOKEN_MAPA.read_text() if TOKEN_MAPA.exists() else '',
+    }
+
+
+def _iniciar_proceso():
+    global _contexto
+    if _contexto is None:
+        _contexto = cargar_contexto()
+
+
+def firma(contexto):
+    """Identifica el contenido de los reportes: versión de los datos, de los reportes y token del mapa."""
+    token = hashlib.sha256(contexto['token'].encode()).hexdigest()[:8]
+    return f"{contexto['huella']}-r{VERSION_REPORTES}-{token}"
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Combinaciones
+def _slug(valor):
+    return re.sub(r'[^a-z0-9]+', '-', str(valor).lower()).strip('-')
+
+
+def combinaciones(indice, años=None, comunas=None):
+    """Devuelve `(nombre, selecciones)` para cada comuna × año, más los totales (None = todos los valores)."""
+    todas = {dimension: list(indice.valores[dimension]) for dimension in DIMENSIONES}
+    años = [año for año in todas['AAAA'] if not años or año in años]
+    comunas = [comuna for comuna in todas['COMUNA'] if not comunas or comuna in comunas]
+
+    tareas = []
+    for año in [None, *años]:
+        for comuna in [None, *comunas]:
+            selecciones = dict(todas)
+            if año is not None:
+                selecciones['AAAA'] = [año]
+            if comuna is not None:
+                selecciones['COMUNA'] = [comuna]
+            nombre = f"{año or 'todos'}_{_slug(comuna) if comuna is not None else 'todas'}"
+            tareas.append((nombre, selecciones))
+    return tareas
+
+
+def _archivos(nombre, formatos):
+    archivos = []
+    if 'html' in formatos:
+        archivos.append(f'html/{nombre}.html')
+    if 'json' in formatos:
+        archivos.append(f'json/{nombre}.json')
+    if 'png' in formatos:
+        archivos.extend(f'png/{nombre}/{grafico}.png' for grafico in figuras.GRAFICOS)
+    return archivos
+
+
+def pendientes(tareas, formatos, salida, firma_actual, forzar=False):
+    """Filtra las combinaciones cuyos archivos faltan o se generaron con otra firma."""
+    if forzar:
+        return tareas
+    reportes = leer_manifiesto(salida).get('reportes', {})
+    resultado = []
+    for nombre, selecciones in tareas:
+        registro = reportes.get(nombre, {})
+        al_dia = (
+            registro.get('firma') == firma_actual
+            and set(formatos) <= set(registro.get('formatos', []))
+            and all((salida / archivo).exists() for archivo in _archivos(nombre, formatos))
+        )
+        if not al_dia:
+            resultado.append((nombre, selecciones))
+    return resultado
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Manifiesto
+def leer_manifiesto(salida):
+    ruta = Path(salida) / MANIFIESTO
+    if not ruta.exists():
+        return {}
+    try:
+        return json.loads(ruta.read_text(encoding='utf-8'))
+    except ValueError:
+        return {}
+
+
+def escribir_manifiesto(manifiesto, salida):
+    ruta = Path(salida) / MANIFIESTO
+    temporal = ruta.with_suffix('.json.tmp')
+    temporal.write_text(json.dumps(manifiesto, indent=2, ensure_ascii=False), encoding='utf-8')
+    temporal.replace(ruta)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Renderizado
+def _ultima_fila(df):
+    # Última fila cómo dict de tipos de Python (NaN -> None)
+    return json.loads(df.iloc[-1:].to_json(orient='records'))[0] if len(df) else None
+
+
+def resumen(contexto, selecciones, casos):
+    """Casos totales y KPIs de la selección (los mismos indicadores que muestra la página)."""
+    return {
+        'casos': casos,
+        'kpi_homicidios': _ultima_fila(contexto['kpi'].homicidios_semestrales(selecciones)),
+        'kpi_motos': _ultima_fila(contexto['kpi'].motos_anuales(selecciones)),
+    }
+
+
+def _titulo(selecciones, contexto):
+    años, comunas = selecciones['AAAA'], selecciones['COMUNA']
+    todos_años = len(años) == len(contexto['indice'].valores['AAAA'])
+    todas_comunas = len(comunas) == len(contexto['indice'].valores['COMUNA'])
+    return f"{'Todas las comunas' if todas_comunas else comunas[0]} · {'todos los años' if todos_años else años[0]}"
+
+
+def _html(titulo, datos, figs):
+    partes = [
+        '<!DOCTYPE html>',
+        '<html lang="es"><head><meta charset="utf-8">',
+        f'<title>Siniestros viales · {escape(titulo)}</title>',
+        '<script src="plotly.min.js"></script>',
+        '</head><body>',
+        f'<h2>Siniestros viales · {escape(titulo)}</h2>',
+        f"<h4>Casos totales: {datos['casos']}</h4>",
+    ]
+    for etiqueta, kpi in [('Homicidios del último semestre', datos['kpi_homicidios']), ('Víctimas en moto del último año', datos['kpi_motos'])]:
+        if kpi:
+            # Sin período anterior no hay objetivo
+            objetivo = f" (objetivo: menos de {formatear(kpi['OBJETIVO'])})" if kpi['OBJETIVO'] is not None else ''
+            partes.append(f"<p>{etiqueta}: {formatear(kpi['ACTUAL'])}{objetivo}</p>")
+    partes.extend(fig.to_html(full_html=False, include_plotlyjs=False) for fig in figs.values())
+    partes.append('</body></html>')
+    return '\n'.join(partes)
+
+
+def renderizar(nombre, selecciones, formatos, salida, contexto=None):
+    """Genera los archivos de una combinación. Devuelve `(nombre, archivos, segundos, error)`."""
+    contexto = contexto or _contexto
+    inicio = time.perf_counter()
+    try:
+        tablero = figuras.FigurasDashboard(
+            selecciones, contexto['cubo'], contexto['piramide'], contexto['token'],
+            contexto['df_final'], contexto['indice'],
+        )
+        figs = tablero.todas()
+        datos = resumen(contexto, selecciones, tablero.casos)
+        titulo = _titulo(selecciones, contexto)
+
+        if 'html' in formatos:
+            (salida / 'html' / f'{nombre}.html').write_text(_html(titulo, datos, figs), encoding='utf-8')
+        if 'json' in formatos:
+            documento = {
+                'titulo': titulo,
+                'selecciones': {dimension: [str(valor) for valor in valores] for dimension, valores in selecciones.items()},
+                **datos,
+                'figuras': {grafico: json.loads(fig.to_json()) for grafico, fig in figs.items()},
+            }
+            (salida / 'json' / f'{nombre}.json').write_text(json.dumps(documento, ensure_ascii=False), encoding='utf-8')
+        if 'png' in formatos:
+            (salida / 'png' / nombre).mkdir(parents=True, exist_ok=True)
+            for grafico, fig in figs.items():
+                fig.write_image(salida / 'png' / nombre / f'{grafico}.png')
+    except Exception as error:
+        return nombre, [], time.perf_counter() - inicio, repr(error)
+    return nombre, _archivos(nombre, formatos), time.perf_counter() - inicio, None
+
+
+def _preparar_salida(salida, formatos):
+    for formato in formatos:
+        (salida / formato).mkdir(parents=True, exist_ok=True)
+    if 'html' in formatos and not (salida / 'html' / 'plotly.min.js').exists():
+        # Un solo plotly.js para todos los HTML
+        from plotly.offline import get_plotlyjs
+
+        (salida / 'html' / 'plotly.min.js').write_text(get_plotlyjs(), encoding='utf-8')
+
+
+def generar(salida=DIR_SALIDA, formatos=('html', 'json'), años=None, comunas=None, procesos=None, forzar=False):
+    """Genera los reportes que falten o estén desactualizados. Devuelve la cantidad generada, omitida y con error."""
+    global _contexto
+
+    salida = Path(salida)
+    formatos = [formato for formato in FORMATOS if formato in formatos]
+    if 'png' in formatos and not png_disponible():
+        raise RuntimeError('Para exportar PNG se necesita el paquete kaleido (pip install kaleido)')
+
+    # El proceso principal deja los binarios listos: así los trabajadores sólo los leen.
+    # Con fork además heredan estos objetos sin copiarlos.
+    _contexto = cargar_contexto()
+    firma_actual = firma(_contexto)
+    tareas = combinaciones(_contexto['indice'], años, comunas)
+    por_generar = pendientes(tareas, formatos, salida, firma_actual, forzar)
+    _preparar_salida(salida, formatos)
+
+    manifiesto = leer_manifiesto(salida)
+    if manifiesto.get('version') != VERSION_REPORTES:
+        manifiesto = {'version': VERSION_REPORTES, 'reportes': {}}
+
+    procesos = procesos or os.cpu_count() or 1
+    if procesos == 1 or len(por_generar) <= 1:
+        resultados = (renderizar(nombre, selecciones, formatos, salida) for nombre, selecciones in por_generar)
+        resultados = list(resultados)
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_proceso) as pool:
+            futuros = [pool.submit(renderizar, nombre, selecciones, formatos, salida) for nombre, selecciones in por_generar]
+            resultados = [futuro.result() for futuro in as_completed(futuros)]
+
+    errores = 0
+    for nombre, archivos, segundos, error in resultados:
+        if error:
+            errores += 1
+            print(f'{nombre:<24} error: {error}', file=sys.stderr)
+            continue
+        manifiesto['reportes'][nombre] = {
+            'firma': firma_actual,
+            'formatos': formatos,
+            'archivos': archivos,
+            'segundos': round(segundos, 3),
+        }
+    escribir_manifiesto(manifiesto, salida)
+    return len(por_generar) - errores, len(tareas) - len(por_generar), errores
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Línea de comandos
+def _comuna(valor):
+    # Acepta el número de comuna o la etiqueta del dashboard ('COMUNA 14')
+    return etl.etiqueta_comuna(int(valor)) if valor.isdigit() else valor.upper()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Genera reportes estáticos del dashboard para cada comuna y año')
+    parser.add_argument('--salida', type=Path, default=DIR_SALIDA, help='carpeta de salida (por defecto ./reportes)')
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=['html', 'json'])
+    parser.add_argument('--años', nargs='+', type=int, help='años a generar (por defecto todos)')
+    parser.add_argument('--comunas', nargs='+', type=_comuna, help='comunas a generar, por número o etiqueta (por defecto todas)')
+    parser.add_argument('--procesos', type=int, help='cantidad de procesos (por defecto uno por CPU)')
+    parser.add_argument('--forzar', action='store_true', help='regenerar también los reportes al día')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        generados, omitidos, errores = generar(args.salida, args.formatos, args.años, args.comunas, args.procesos, args.forzar)
+    except RuntimeError as error:
+        sys.exit(str(error))
+    print(f'{generados} reportes generados, {omitidos} al día, {errores} con error en {time.perf_counter() - inicio:.1f} s ({args.salida})')
+    sys.exit(1 if errores else 0)
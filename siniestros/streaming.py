@@ -0,0 +1,194 @@
+import math
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from siniestros import almacenamiento, etl, metricas
+from siniestros.cubo import DIMENSIONES_CUBO, CuboConteos, agregar
+from siniestros.kpi import DIMENSIONES_KPI, MotorKPI, agregar_kpi
+from siniestros.mapa import NIVELES, PiramideEspacial, agregar_nivel
+
+#---------------------------------------------------------------------------------------------------------------------
+# Ingesta por bloques para datasets que no entran en memoria
+#
+# SINIESTROS_MODO=streaming hace que la página use sólo los agregados (cubo y pirámide)
+# calculados acá, sin materializar `df_final`.
+
+# Filas de CSV que se leen por bloque
+FILAS_POR_BLOQUE = 500_000
+
+# Tamaño aproximado de CSV de víctimas que se une de una vez (define la cantidad de particiones)
+BYTES_POR_PARTICION = 256 * 2**20
+
+# Filas de cada dataset crudo que se muestran en los visores en modo streaming
+FILAS_MUESTRA = 10_000
+
+
+def activo():
+    return os.environ.get('SINIESTROS_MODO', '').lower() == 'streaming'
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Generadores de bloques
+def bloques_hechos(ruta, filas=FILAS_POR_BLOQUE):
+    """Lee Hechos.csv por bloques, sólo con las columnas de `hechos_reducido`, con SD normalizado y coordenadas limpias."""
+    for bloque in pd.read_csv(ruta, usecols=etl.COLUMNAS_HECHOS, chunksize=filas):
+        bloque = etl.sin_dato_a_nulo(bloque)
+        bloque['pos x'] = etl.limpiar_y_convertir(bloque['pos x'])
+        bloque['pos y'] = etl.limpiar_y_convertir(bloque['pos y'])
+        yield bloque
+
+
+def bloques_victimas(ruta, filas=FILAS_POR_BLOQUE):
+    """Lee Victimas.csv por bloques, con las columnas de `victimas_reducido` y la edad ya agrupada."""
+    for bloque in pd.read_csv(ruta, usecols=etl.COLUMNAS_VICTIMAS, chunksize=filas):
+        bloque = etl.sin_dato_a_nulo(bloque).rename(columns={'ID_hecho': 'ID'})
+        edad = pd.to_numeric(bloque.pop('EDAD'), errors='coerce')
+        bloque['GRUPO ETARIO'] = pd.cut(edad, bins=etl.BINS_EDAD, labels=etl.GRUPOS_ETARIOS, right=False)
+        yield bloque
+
+
+def particionar(bloques, directorio, nombre, particiones):
+    """Reparte cada bloque en `particiones` archivos según el hash del ID.
+
+    Así todas las filas de un mismo hecho (y sus víctimas) quedan en la misma
+    partición y cada partición se puede unir por separado.
+    """
+    rutas = [Path(directorio) / f'{nombre}_{numero}.pkl' for numero in range(particiones)]
+    archivos = [open(ruta, 'wb') for ruta in rutas]
+    try:
+        for bloque in bloques:
+            numero = pd.util.hash_pandas_object(bloque['ID'], index=False).to_numpy() % particiones
+            for particion, grupo in bloque.groupby(numero):
+                pickle.dump(grupo, archivos[particion], protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for archivo in archivos:
+            archivo.close()
+    return rutas
+
+
+def leer_particion(ruta):
+    # Cada partición es una secuencia de DataFrames serializados uno detrás de otro
+    partes = []
+    with open(ruta, 'rb') as archivo:
+        while True:
+            try:
+                partes.append(pickle.load(archivo))
+            except EOFError:
+                break
+    return pd.concat(partes, ignore_index=True) if partes else None
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Agregación incremental
+def acumular(acumulado, parcial, claves):
+    """Suma los conteos de `parcial` a los de `acumulado` (ambos agregados por `claves`)."""
+    if acumulado is None:
+        return parcial
+    unidos = pd.concat([acumulado, parcial], ignore_index=True)
+    return unidos.groupby(claves, observed=True, dropna=False).sum().reset_index()
+
+
+# Etapas del ETL que se aplican después de unir cada partición. La comuna se
+# etiqueta al final, sobre los agregados, para que las etiquetas sean las mismas en todas las particiones.
+ETAPAS_UNION = [etl.etapa_hora, etl.etapa_semestres, etl.etapa_victima]
+
+
+def _tipar_agregado(celdas):
+    celdas = etl.etapa_comunas({'df_final': celdas})['df_final']
+    return etl.etapa_tipar({'df_final': celdas})['df_final'].reset_index(drop=True)
+
+
+class AgregadosStreaming:
+    """Cubo de conteos, pirámide espacial y KPIs calculados sin tener todo `df_final` en memoria."""
+
+    def __init__(self, cubo, piramide, kpi, filas):
+        self.cubo = cubo
+        self.piramide = piramide
+        self.kpi = kpi
+        self.filas = filas
+
+
+def ingerir(ruta_hechos=None, ruta_victimas=None, particiones=None, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Procesa los CSV por bloques y devuelve los agregados que usa el dashboard.
+
+    El pico de memoria queda acotado por el tamaño de un bloque, de una partición
+    y de los agregados (que dependen de la cantidad de celdas, no de filas).
+    """
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    if particiones is None:
+        particiones = max(1, math.ceil(os.path.getsize(ruta_victimas) / BYTES_POR_PARTICION))
+
+    cubo = kpi = None
+    niveles = {tamaño: None for tamaño in NIVELES}
+    filas = 0
+
+    with tempfile.TemporaryDirectory() as temporal:
+        with metricas.tramo('streaming.particionar'):
+            rutas_hechos = particionar(bloques_hechos(ruta_hechos, filas_por_bloque), temporal, 'hechos', particiones)
+            rutas_victimas = particionar(bloques_victimas(ruta_victimas, filas_por_bloque), temporal, 'victimas', particiones)
+
+        for ruta_h, ruta_v in zip(rutas_hechos, rutas_victimas):
+            with metricas.tramo('streaming.particion'):
+                hechos, victimas = leer_particion(ruta_h), leer_particion(ruta_v)
+                if hechos is None or victimas is None:
+                    continue
+
+                unido = pd.merge(hechos, victimas, on='ID', how='inner')
+                unido = etl.ejecutar_pipeline({'df_final': unido}, ETAPAS_UNION)['df_final']
+                filas += len(unido)
+
+                cubo = acumular(cubo, agregar(unido), DIMENSIONES_CUBO)
+                kpi = acumular(kpi, agregar_kpi(unido), DIMENSIONES_KPI)
+                for tamaño in NIVELES:
+                    parcial = agregar_nivel(unido, tamaño)
+                    claves = [columna for columna in parcial.columns if columna not in ('SUMA_X', 'SUMA_Y', 'CASOS')]
+                    niveles[tamaño] = acumular(niveles[tamaño], parcial, claves)
+
+    if cubo is None:
+        raise ValueError('Los CSV no tienen hechos con víctimas')
+
+    return AgregadosStreaming(
+        CuboConteos(_tipar_agregado(cubo)),
+        PiramideEspacial({tamaño: _tipar_agregado(celdas) for tamaño, celdas in niveles.items()}),
+        MotorKPI(_tipar_agregado(kpi)),
+        filas,
+    )
+
+
+def muestras(ruta_hechos=None, ruta_victimas=None, filas=FILAS_MUESTRA):
+    """Primeras filas de cada dataset crudo, para los visores."""
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    hechos = etl.sin_dato_a_nulo(almacenamiento.tipar(pd.read_csv(ruta_hechos, nrows=filas), 'hechos'))
+    victimas = etl.sin_dato_a_nulo(almacenamiento.tipar(pd.read_csv(ruta_victimas, nrows=filas), 'victimas'))
+    return hechos, victimas
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _agregados_version(huella, ruta_hechos, ruta_victimas):
+    return ingerir(ruta_hechos, ruta_victimas)
+
+
+def cargar_agregados(ruta_hechos=None, ruta_victimas=None):
+    """Devuelve los agregados de la versión actual de los CSV."""
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    huella = etl.huella_version(ruta_hechos, ruta_victimas)
+    return _agregados_version(huella, str(ruta_hechos), str(ruta_victimas))
+
+
+@st.cache_resource(max_entries=etl.MAX_VERSIONES, show_spinner=False)
+def _muestras_version(huella, ruta_hechos, ruta_victimas):
+    # Compartidas por todas las sesiones cómo los demás datos: no se deben modificar
+    return muestras(ruta_hechos, ruta_victimas)
+
+
+def cargar_muestras(ruta_hechos=None, ruta_victimas=None):
+    ruta_hechos, ruta_victimas = etl.rutas(ruta_hechos, ruta_victimas)
+    huella = etl.huella_version(ruta_hechos, ruta_victimas)
+    return _muestras_version(huella, str(ruta_hechos), str(ruta_victimas))
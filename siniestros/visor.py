@@ -0,0 +1,147 @@
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from siniestros import etl
+
+#---------------------------------------------------------------------------------------------------------------------
+# Visor paginado de los datasets crudos
+TAMAÑOS_PAGINA = [25, 50, 100, 250]
+
+_PALABRA = re.compile(r'\w+')
+
+
+def _tokenizar(serie):
+    # Devuelve una fila por (posición, palabra) de una serie de texto
+    return serie.astype(str).str.lower().str.findall(_PALABRA.pattern).explode().dropna()
+
+
+class IndiceTexto:
+    """Índice invertido (palabra -> filas) sobre las columnas de texto de un DataFrame.
+
+    Cada palabra de la búsqueda se compara cómo prefijo contra el vocabulario
+    ordenado, y las filas de las distintas palabras se intersectan.
+    """
+
+    def __init__(self, df):
+        pares = []
+        for columna in df.columns:
+            serie = df[columna]
+
+            # En las categóricas tokenizo sólo las categorías y las uno a las filas por código
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                tokens = _tokenizar(pd.Series(serie.cat.categories))
+                tokens = pd.DataFrame({'codigo': tokens.index, 'token': tokens.to_numpy()})
+                codigos = pd.DataFrame({'codigo': serie.cat.codes.to_numpy(), 'fila': np.arange(len(serie))})
+                pares.append(codigos.merge(tokens, on='codigo')[['token', 'fila']])
+
+            elif not pd.api.types.is_numeric_dtype(serie):
+                tokens = _tokenizar(serie.dropna())
+                pares.append(pd.DataFrame({'token': tokens.to_numpy(), 'fila': tokens.index.to_numpy()}))
+
+        # Ordeno los pares por palabra y fila y corto el arreglo de filas en cada palabra nueva
+        pares = pd.concat(pares, ignore_index=True) if pares else pd.DataFrame({'token': [], 'fila': []})
+        pares = pares.astype({'token': str, 'fila': np.int64}).drop_duplicates().sort_values(['token', 'fila'])
+        self.vocabulario, inicios = np.unique(pares['token'].to_numpy(dtype=str), return_index=True)
+        self.filas = np.split(pares['fila'].to_numpy(), inicios[1:])
+
+    def buscar(self, texto):
+        """Devuelve las posiciones de las filas que contienen todas las palabras de `texto`, o None si no hay búsqueda."""
+        palabras = _PALABRA.findall(texto.lower())
+        if not palabras:
+            return None
+
+        resultado = None
+        for palabra in palabras:
+            # Rango del vocabulario que empieza con la palabra buscada
+            desde = np.searchsorted(self.vocabulario, palabra, side='left')
+            hasta = np.searchsorted(self.vocabulario, palabra + '\U0010ffff', side='left')
+            if desde == hasta:
+                return np.array([], dtype=np.int64)
+
+            filas = np.unique(np.concatenate(self.filas[desde:hasta]))
+            resultado = filas if resultado is None else np.intersect1d(resultado, filas, assume_unique=True)
+        return resultado
+
+
+class VisorPaginado:
+    """Sirve páginas de un DataFrame ya filtrado, ordenado y proyectado."""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.indice_texto = IndiceTexto(self.df)
+        self._ordenes = {}
+
+    def orden(self, columna, ascendente):
+        # Guardo el orden de cada columna para no reordenar en cada página
+        clave = (columna, ascendente)
+        if clave not in self._ordenes:
+            self._ordenes[clave] = (
+                self.df[columna].sort_values(ascending=ascendente, na_position='last', kind='stable').index.to_numpy()
+            )
+        return self._ordenes[clave]
+
+    def pagina(self, numero, tamaño, columnas=None, orden=None, ascendente=True, busqueda=''):
+        """Devuelve `(ventana, total de filas)` para la página `numero` (desde 1)."""
+        posiciones = self.orden(orden, ascendente) if orden else np.arange(len(self.df))
+
+        encontradas = self.indice_texto.buscar(busqueda)
+        if encontradas is not None:
+            mascara = np.zeros(len(self.df), dtype=bool)
+            mascara[encontradas] = True
+            posiciones = posiciones[mascara[posiciones]]
+
+        inicio = (numero - 1) * tamaño
+        ventana = self.df.iloc[posiciones[inicio:inicio + tamaño]]
+        if columnas:
+            ventana = ventana[columnas]
+        return ventana, len(posiciones)
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Interfaz
+@st.fragment
+def mostrar_visor(visor, clave, column_config=None):
+    """Dibuja los controles del visor y la página pedida. Sólo se envía al navegador la ventana visible.
+
+    Es un fragmento: buscar, ordenar o cambiar de página sólo vuelve a ejecutar el visor.
+    """
+    controles = st.columns([3, 3, 2, 1])
+    with controles[0]:
+        busqueda = st.text_input('Buscar', key=f'{clave}_busqueda')
+    with controles[1]:
+        columnas = st.multiselect('Columnas', list(visor.df.columns), key=f'{clave}_columnas')
+    with controles[2]:
+        orden = st.selectbox('Ordenar por', [None, *visor.df.columns], key=f'{clave}_orden')
+    with controles[3]:
+        ascendente = st.checkbox('Ascendente', value=True, key=f'{clave}_ascendente')
+
+    paginado = st.columns([1, 1, 4])
+    with paginado[0]:
+        tamaño = st.selectbox('Filas por página', TAMAÑOS_PAGINA, key=f'{clave}_tamaño')
+
+    # Cuento las filas antes de elegir la página para acotar el número de página
+    _, total = visor.pagina(1, 0, busqueda=busqueda)
+    paginas = max(1, -(-total // tamaño))
+
+    with paginado[1]:
+        numero = st.number_input('Página', min_value=1, max_value=paginas, value=1, step=1, key=f'{clave}_pagina')
+
+    numero = min(numero, paginas)
+    ventana, total = visor.pagina(numero, tamaño, columnas, orden, ascendente, busqueda)
+    st.dataframe(ventana, column_config=column_config)
+    st.caption(f'Página {numero} de {paginas} ({total} filas)')
+
+
+#---------------------------------------------------------------------------------------------------------------------
+# Caché
+@st.cache_resource(max_entries=2 * etl.MAX_VERSIONES, show_spinner=False)
+def _visor_version(huella, nombre, _df):
+    return VisorPaginado(_df)
+
+
+def cargar_visor(nombre, df, huella=None):
+    """Devuelve el visor del dataset `nombre` para la versión actual de los datos."""
+    return _visor_version(huella or etl.huella_version(), nombre, df)